@@ -1,8 +1,14 @@
 from flask import Flask
 from routes.main import main_bp
 from routes.parroquias import parroquias_bp
+from routes.provincias import provincias_bp
 from config import config
+from utils import metrics, profiling
+from utils.cache_manager import cache
+from utils.data_service import data_service
+from utils.result_store import results
 import os
+import threading
 
 app = Flask(__name__)
 
@@ -14,13 +20,35 @@ else:
 
 app.register_blueprint(main_bp)
 app.register_blueprint(parroquias_bp)
+app.register_blueprint(provincias_bp)
+
+# Cachés con nombre: TTL, presupuesto de memoria y /api/cache-stats
+cache.init_app(app)
+
+# Resultados de agregación persistidos en disco entre reinicios
+results.init_app(app)
+
+# Server-Timing por petición y endpoint /metrics (Prometheus)
+metrics.init_app(app)
+
+# Perfilado opcional de peticiones lentas (ver PROFILING_* en config.py)
+profiling.init_app(app)
+
+# Las dependencias geoespaciales se importan de forma diferida: /health responde en cuanto
+# arranca el worker y, si está activado, el precalentamiento corre en segundo plano
+if app.config.get('WARMUP_ON_START'):
+    threading.Thread(target=data_service.warm_up, name="warmup", daemon=True).start()
+
+# Headers de seguridad (asgi.py agrega los mismos a sus rutas asíncronas)
+SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+}
 
-# Configurar headers de seguridad
 @app.after_request
 def after_request(response):
-    response.headers['X-Content-Type-Options'] = 'nosniff'
-    response.headers['X-Frame-Options'] = 'DENY'
-    response.headers['X-XSS-Protection'] = '1; mode=block'
+    response.headers.update(SECURITY_HEADERS)
     return response
 
 @app.route('/health')
@@ -0,0 +1,121 @@
+"""Aplicación ASGI: API ligera en asyncio montada delante de la aplicación Flask.
+
+Las rutas JSON (`/health`, `/api/population-by-canton`, `/api/population-by-parroquia`,
+`/api/population-by-provincia`) se atienden en el event loop; el cálculo de agregados (CPU) se delega a un pool de
+hilos, de modo que un renderizado pesado de `/` o `/parroquias` no bloquea a las
+peticiones ligeras que llegan detrás. Estas rutas no pasan por los `after_request` de
+Flask, así que agregan aquí los mismos headers de seguridad y registran su duración en
+`/metrics` con el nombre de endpoint de Flask. El resto de rutas pasa a Flask vía WSGI.
+
+Ejecutar con:
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.wsgi import WsgiToAsgi
+from app import app as flask_app, SECURITY_HEADERS as FLASK_SECURITY_HEADERS
+from utils.data_service import data_service
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Pool dedicado al cálculo de agregados para no competir con los renderizados de Flask
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="api-aggregates")
+
+SECURITY_HEADERS = [
+    (name.lower().encode(), value.encode()) for name, value in FLASK_SECURITY_HEADERS.items()
+]
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ] + SECURITY_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def health(scope, receive, send):
+    """Health check para Railway (no depende de Flask ni de los datos)"""
+    await send_json(send, {"status": "healthy", "message": "App running"})
+
+
+def aggregate_endpoint(calculate, description):
+    """Endpoint que sirve un agregado cacheado calculándolo en el pool si hace falta"""
+    async def endpoint(scope, receive, send):
+        try:
+            loop = asyncio.get_running_loop()
+            population_data = await loop.run_in_executor(executor, calculate)
+            await send_json(send, {'success': True, 'data': population_data})
+        except Exception as e:
+            logger.error(f"Error en API población por {description}: {e}")
+            await send_json(send, {'success': False, 'error': str(e)}, status=500)
+    return endpoint
+
+
+ASYNC_ROUTES = {
+    "/health": health,
+    "/api/population-by-canton": aggregate_endpoint(data_service.calculate_population_by_canton, "cantón"),
+    "/api/population-by-parroquia": aggregate_endpoint(data_service.calculate_population_by_parroquia, "parroquia"),
+    "/api/population-by-provincia": aggregate_endpoint(data_service.calculate_population_by_provincia, "provincia"),
+}
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+# Mismas etiquetas que las vistas de Flask en mapa_request_duration_seconds
+_url_adapter = flask_app.url_map.bind("localhost")
+ROUTE_ENDPOINTS = {path: _url_adapter.match(path, method="GET")[0] for path in ASYNC_ROUTES}
+
+
+async def observed(endpoint, scope, receive, send):
+    """Ejecuta una ruta asíncrona con Server-Timing y la observación de /metrics"""
+    start = time.perf_counter()
+    status = 500
+
+    async def send_observed(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            total = time.perf_counter() - start
+            headers = list(message.get("headers", [])) + [(b"server-timing", f"total;dur={total * 1000:.1f}".encode())]
+            message = dict(message, headers=headers)
+        await send(message)
+
+    try:
+        await endpoint(scope, receive, send_observed)
+    finally:
+        registry.observe(
+            "mapa_request_duration_seconds", time.perf_counter() - start,
+            endpoint=ROUTE_ENDPOINTS[scope["path"]], status=status
+        )
+
+
+async def app(scope, receive, send):
+    """Despacha las rutas ligeras en asyncio y delega el resto a Flask"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        await wsgi_app(scope, receive, send)
+        return
+
+    endpoint = ASYNC_ROUTES.get(scope["path"]) if scope["method"] == "GET" else None
+    if endpoint is not None:
+        await observed(endpoint, scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1 @@
+"""Suite de benchmarks de las rutas costosas de la aplicación"""
@@ -0,0 +1,64 @@
+"""Presupuesto de tiempo de importación de la aplicación (arranque del worker).
+
+Importa `app` y `asgi` en un intérprete limpio, mide el tiempo con `-X importtime` y
+comprueba que las dependencias geoespaciales no se carguen al importar.
+
+Uso:
+    python -m benchmarks.import_budget --budget 0.5
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que solo deben cargarse al renderizar o calcular, nunca al arrancar
+HEAVY_MODULES = ("folium", "branca", "geopandas", "shapely", "pandas", "pyproj", "numpy")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+
+
+def measure(module):
+    """Tiempo acumulado de importación (s) y módulos pesados cargados, en un proceso nuevo"""
+    code = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative = {
+        match.group(2): int(match.group(1))
+        for match in map(IMPORTTIME_LINE.match, proc.stderr.splitlines()) if match
+    }
+    return cumulative[module] / 1e6, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación de la aplicación")
+    parser.add_argument("--budget", type=float, default=0.5, help="Segundos máximos por módulo (mediana)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="*", default=["app", "asgi"])
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        median = statistics.median(seconds for seconds, _ in runs)
+        heavy = runs[-1][1]
+        ok = median <= args.budget and not heavy
+        print(f"{'✅' if ok else '❌'} import {module:6s} {median:.3f}s (presupuesto {args.budget:.3f}s)"
+              + (f"  módulos pesados: {', '.join(heavy)}" if heavy else ""))
+        if not ok:
+            failures.append(module)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Benchmarks de las rutas costosas: carga, agregación, muestreo y renderizado.
+
+Uso:
+    python -m benchmarks.run --points 200000 --cantones 220 --repeat 3
+
+Cada ejecución se agrega a benchmarks/history.json y se compara con la última
+ejecución con los mismos parámetros; `--fail-on-regression` devuelve código 1 si
+algún benchmark empeora más que `--threshold`.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HISTORY_PATH = Path(__file__).resolve().parent / "history.json"
+sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.synthetic import write_dataset
+
+
+def build_benchmarks():
+    """Lista de (nombre, preparación, función medida); la preparación no se mide"""
+    # Importar después de fijar MAPA_DATA_DIR
+    from app import app
+    from utils.cache_manager import cache
+    from utils.clipping import clip_mask
+    from utils.data_loader import load_geojson_with_fallback
+    from utils.data_service import data_service
+    from utils.result_store import results
+
+    # Medir el cálculo real, no la lectura de resultados persistidos en disco
+    results.configure(enabled=False)
+
+    client = app.test_client()
+
+    def cold():
+        cache.clear()
+
+    def warm_inputs(*loaders):
+        def setup():
+            cache.clear()
+            for loader in loaders:
+                loader()
+        return setup
+
+    def warm_pages():
+        for path in ("/", "/parroquias"):
+            client.get(path)
+
+    raw_points = {}
+
+    def warm_clip():
+        cache.clear()
+        data_service.load_ecuador_boundaries()
+        if 'gdf' not in raw_points:
+            raw_points['gdf'] = load_geojson_with_fallback("poblacion_ecuador_realistic.geojson", "población")
+
+    def clip():
+        gdf = raw_points['gdf']
+        clip_mask(gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy(), data_service.load_ecuador_boundaries()[1])
+
+    batch = {}
+
+    def warm_locate():
+        warm_inputs(data_service.load_unit_locator)()
+        if 'body' not in batch:
+            import numpy as np
+            rng = np.random.default_rng(0)
+            coords = np.column_stack([rng.uniform(-81.1, -75.2, 100000), rng.uniform(-5.0, 1.5, 100000)])
+            batch['body'] = coords.astype('<f8').tobytes()
+
+    def locate_batch():
+        response = client.post("/api/locate/batch?format=binary", data=batch['body'],
+                               content_type="application/octet-stream")
+        assert response.status_code == 200, f"/api/locate/batch -> {response.status_code}"
+
+    def catchment_batch():
+        if 'facilities' not in batch:
+            import numpy as np
+            rng = np.random.default_rng(1)
+            batch['facilities'] = {
+                'lons': rng.uniform(-80.5, -76.0, 5000).tolist(),
+                'lats': rng.uniform(-4.0, 1.0, 5000).tolist(),
+                'radius_km': rng.uniform(2, 30, 5000).tolist(),
+            }
+        response = client.post("/api/catchment", json=batch['facilities'])
+        assert response.status_code == 200, f"/api/catchment -> {response.status_code}"
+
+    def render(path):
+        def run():
+            response = client.get(path)
+            assert response.status_code == 200, f"{path} -> {response.status_code}"
+        return run
+
+    return [
+        ("load_geojson_with_fallback", cold,
+         lambda: load_geojson_with_fallback("poblacion_ecuador_realistic.geojson", "población")),
+        ("clip_to_ecuador", warm_clip, clip),
+        ("calculate_population_by_canton",
+         warm_inputs(data_service.load_cantones_data, data_service.load_all_population_data),
+         data_service.calculate_population_by_canton),
+        ("calculate_population_by_parroquia",
+         warm_inputs(data_service.load_parroquias_data, data_service.load_all_population_data),
+         data_service.calculate_population_by_parroquia),
+        ("build_cluster_index", warm_inputs(data_service.load_all_population_data),
+         data_service.load_cluster_index),
+        ("api_clusters", warm_inputs(data_service.load_cluster_index),
+         render("/api/clusters?bbox=-81.1,-5.0,-75.2,1.5&zoom=7")),
+        ("build_hex_grids", warm_inputs(data_service.load_all_population_data),
+         data_service.load_hex_grids),
+        ("api_hexbin", warm_inputs(data_service.load_hex_grids), render("/api/hexbin?resolution=10")),
+        ("api_locate_batch_100k", warm_locate, locate_batch),
+        ("api_catchment_5000", warm_inputs(data_service.load_cluster_index), catchment_batch),
+        ("render_mapa", warm_pages, render("/")),
+        ("render_parroquias", warm_pages, render("/parroquias")),
+    ]
+
+
+def run_benchmark(setup, func, repeat):
+    """Mide tiempos (sin tracemalloc) y el pico de memoria (en una ejecución aparte)"""
+    timings = []
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds_min": round(min(timings), 4),
+        "seconds_median": round(statistics.median(timings), 4),
+        "peak_mb": round(peak / 1e6, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def load_history(path):
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return []
+
+
+def compare(previous, current, threshold):
+    """Compara con la ejecución anterior; devuelve la lista de regresiones"""
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before:
+            continue
+        for metric in ("seconds_median", "peak_mb"):
+            if before[metric] <= 0:
+                continue
+            change = (result[metric] - before[metric]) / before[metric]
+            flag = "⚠️" if change > threshold else "  "
+            print(f"{flag} {name:36s} {metric:15s} {before[metric]:>10} -> {result[metric]:>10} ({change:+.1%})")
+            if change > threshold:
+                regressions.append((name, metric, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, agregación y renderizado")
+    parser.add_argument("--points", type=int, default=100000, help="Puntos de población sintéticos")
+    parser.add_argument("--cantones", type=int, default=220, help="Cantones sintéticos (4 parroquias por cantón)")
+    parser.add_argument("--vertices", type=int, default=20, help="Vértices intermedios por borde")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="Ejecutar solo estos benchmarks")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regresión tolerada (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    with tempfile.TemporaryDirectory(prefix="mapa-bench-") as data_dir:
+        print(f"Generando datos: {args.points:,} puntos, {args.cantones} cantones...")
+        write_dataset(data_dir, args.points, args.cantones, args.vertices)
+        os.environ["MAPA_DATA_DIR"] = data_dir
+
+        results = {}
+        for name, setup, func in build_benchmarks():
+            if args.only and name not in args.only:
+                continue
+            results[name] = run_benchmark(setup, func, args.repeat)
+            r = results[name]
+            print(f"{name:36s} {r['seconds_median']:8.3f}s (min {r['seconds_min']:.3f}s)  pico {r['peak_mb']:8.1f} MB")
+
+    entry = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "params": {"points": args.points, "cantones": args.cantones, "vertices": args.vertices},
+        "results": results,
+    }
+
+    history = load_history(args.history)
+    previous = next((h for h in reversed(history) if h["params"] == entry["params"]), None)
+    regressions = []
+    if previous:
+        print(f"\nComparación con {previous['revision']} ({previous['timestamp']}):")
+        regressions = compare(previous, entry, args.threshold)
+
+    history.append(entry)
+    with open(args.history, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+    if regressions and args.fail_on_regression:
+        print(f"\n❌ {len(regressions)} regresiones por encima de {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Generadores de datos sintéticos con la extensión de Ecuador continental para benchmarks"""
+import json
+import math
+from pathlib import Path
+import numpy as np
+
+# Extensión aproximada de Ecuador continental (lon_min, lat_min, lon_max, lat_max)
+ECUADOR_BOUNDS = (-81.1, -5.0, -75.2, 1.5)
+
+PROVINCIAS = [
+    "AZUAY", "BOLIVAR", "CAÑAR", "CARCHI", "COTOPAXI", "CHIMBORAZO", "EL ORO", "ESMERALDAS",
+    "GUAYAS", "IMBABURA", "LOJA", "LOS RIOS", "MANABI", "MORONA SANTIAGO", "NAPO", "PASTAZA",
+    "PICHINCHA", "TUNGURAHUA", "ZAMORA CHINCHIPE", "GALAPAGOS", "SUCUMBIOS", "ORELLANA",
+    "SANTO DOMINGO DE LOS TSACHILAS", "SANTA ELENA",
+]
+
+# Nombres repetidos entre cantones, como ocurre con las parroquias reales
+NOMBRES_PARROQUIA = ["SAN JOSE", "SAN PEDRO", "SANTA ROSA", "LA PAZ", "EL CARMEN", "SAN ANTONIO"]
+
+
+def generate_population_points(n_points, seed=42, bounds=ECUADOR_BOUNDS):
+    """Genera `n_points` puntos con población concentrada en núcleos urbanos"""
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = bounds
+
+    # 60% de puntos alrededor de núcleos urbanos, 40% dispersos
+    n_urban = int(n_points * 0.6)
+    centers = rng.uniform((min_lon, min_lat), (max_lon, max_lat), size=(40, 2))
+    urban = centers[rng.integers(0, len(centers), n_urban)] + rng.normal(0, 0.08, size=(n_urban, 2))
+    rural = rng.uniform((min_lon, min_lat), (max_lon, max_lat), size=(n_points - n_urban, 2))
+    coords = np.clip(np.vstack([urban, rural]), (min_lon, min_lat), (max_lon, max_lat))
+
+    population = np.concatenate([
+        rng.lognormal(5.5, 1.2, n_urban),
+        rng.lognormal(1.5, 1.0, n_points - n_urban),
+    ])
+    return coords, np.round(population, 2)
+
+
+def _edge_polyline(start, end, vertices_per_edge, rng, jitter):
+    """Vértices intermedios deterministas de un borde (compartido por los dos polígonos vecinos)"""
+    t = np.linspace(0, 1, vertices_per_edge + 2)[1:-1, None]
+    points = start + (end - start) * t
+    normal = np.array([-(end - start)[1], (end - start)[0]])
+    offsets = rng.normal(0, jitter, size=(len(t), 1))
+    return [tuple(p) for p in points + normal * offsets]
+
+
+def generate_admin_polygons(n_cantones, vertices_per_edge=20, seed=42, bounds=ECUADOR_BOUNDS):
+    """Genera cantones y parroquias (4 por cantón) con bordes compartidos exactamente.
+
+    Las parroquias son celdas de una malla fina y los cantones bloques de 2x2 parroquias
+    construidos con los mismos bordes, igual que en los límites oficiales.
+    """
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    aspect = (max_lon - min_lon) / (max_lat - min_lat)
+    nx = max(1, int(math.ceil(math.sqrt(n_cantones * aspect))))
+    ny = max(1, int(math.ceil(n_cantones / nx)))
+    fx, fy = nx * 2, ny * 2
+
+    # Esquinas de la malla fina, con perturbación en las interiores
+    xs = np.linspace(min_lon, max_lon, fx + 1)
+    ys = np.linspace(min_lat, max_lat, fy + 1)
+    corners = np.stack(np.meshgrid(xs, ys, indexing='ij'), axis=-1)
+    step = min((max_lon - min_lon) / fx, (max_lat - min_lat) / fy)
+    corners[1:-1, 1:-1] += rng.uniform(-0.2, 0.2, size=(fx - 1, fy - 1, 2)) * step
+
+    edges = {}
+
+    def edge(a, b):
+        """Polilínea del borde entre las esquinas a y b (en el sentido a -> b)"""
+        key = (a, b) if a <= b else (b, a)
+        if key not in edges:
+            edges[key] = _edge_polyline(corners[key[0]], corners[key[1]], vertices_per_edge, rng, 0.05)
+        points = edges[key]
+        return points if key == (a, b) else points[::-1]
+
+    def ring(path):
+        coords = []
+        for a, b in zip(path[:-1], path[1:]):
+            coords.append(tuple(corners[a]))
+            coords.extend(edge(a, b))
+        coords.append(coords[0])
+        return [list(c) for c in coords]
+
+    cantones, parroquias = [], []
+    for i in range(nx):
+        for j in range(ny):
+            if len(cantones) >= n_cantones:
+                break
+            k = len(cantones)
+            provincia_idx = k * len(PROVINCIAS) // n_cantones
+            cod_provincia = f"{provincia_idx + 1:02d}"
+            cod_canton = f"{cod_provincia}{k % 100:02d}"
+            nombre_canton = f"CANTON {k}"
+
+            # Contorno del bloque 2x2 recorriendo los bordes de la malla fina
+            i0, j0 = 2 * i, 2 * j
+            path = ([(i0 + d, j0) for d in range(3)] + [(i0 + 2, j0 + d) for d in range(1, 3)] +
+                    [(i0 + 2 - d, j0 + 2) for d in range(1, 3)] + [(i0, j0 + 2 - d) for d in range(1, 3)])
+            cantones.append({
+                "type": "Feature",
+                "properties": {
+                    "DPA_CANTON": cod_canton, "DPA_DESCAN": nombre_canton,
+                    "DPA_PROVIN": cod_provincia, "DPA_DESPRO": PROVINCIAS[provincia_idx],
+                },
+                "geometry": {"type": "Polygon", "coordinates": [ring(path)]},
+            })
+
+            for p in range(4):
+                a, b = i0 + p // 2, j0 + p % 2
+                parroquias.append({
+                    "type": "Feature",
+                    "properties": {
+                        "DPA_PARROQ": f"{cod_canton}{50 + p:02d}",
+                        "PARROQUIA": NOMBRES_PARROQUIA[(k + p) % len(NOMBRES_PARROQUIA)] if p == 0 else f"{nombre_canton} P{p}",
+                        "CANTON": nombre_canton,
+                        "PROVINCIA": PROVINCIAS[provincia_idx],
+                    },
+                    "geometry": {"type": "Polygon", "coordinates": [ring([(a, b), (a + 1, b), (a + 1, b + 1), (a, b + 1), (a, b)])]},
+                })
+    return cantones, parroquias
+
+
+def generate_country_boundary(n_vertices=4000, seed=42, bounds=ECUADOR_BOUNDS):
+    """Frontera irregular dentro de la extensión: deja fuera esquinas y bordes de la malla"""
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    center = np.array([(min_lon + max_lon) / 2, (min_lat + max_lat) / 2])
+    half = np.array([(max_lon - min_lon) / 2, (max_lat - min_lat) / 2])
+
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 0.85 + sum(
+        rng.uniform(0.01, 0.06) * np.sin(k * angles + rng.uniform(0, 2 * np.pi)) for k in (3, 7, 19, 61)
+    )
+    coords = center + half * np.column_stack([np.cos(angles), np.sin(angles)]) * radius[:, None]
+    ring = [[float(x), float(y)] for x, y in coords]
+    ring.append(ring[0])
+    return {
+        "type": "Feature",
+        "properties": {"name": "Ecuador"},
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+    }
+
+
+def write_dataset(directory, n_points, n_cantones, vertices_per_edge=20, seed=42):
+    """Escribe un conjunto de datos sintético con los nombres de archivo que usa la aplicación"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    coords, population = generate_population_points(n_points, seed)
+    points = [
+        {
+            "type": "Feature",
+            "properties": {"population": float(pop), "region": "continental"},
+            "geometry": {"type": "Point", "coordinates": [float(x), float(y)]},
+        }
+        for (x, y), pop in zip(coords, population)
+    ]
+    cantones, parroquias = generate_admin_polygons(n_cantones, vertices_per_edge, seed)
+
+    for filename, features in [
+        ("poblacion_ecuador_realistic.geojson", points),
+        ("cantones.geojson", cantones),
+        ("parroquiasEcuador.geojson", parroquias),
+        ("ec.json", [generate_country_boundary(seed=seed)]),
+    ]:
+        with open(directory / filename, 'w', encoding='utf-8') as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f, separators=(',', ':'))
+    return directory
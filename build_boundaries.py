@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import logging
+from shapely.geometry import shape, mapping
+from utils.data_loader import (
+    get_data_directory, validate_geojson_file, get_simplified_filename, SIMPLIFICATION_LEVELS
+)
+from utils.topology import simplify_shared
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Capas que comparten bordes se simplifican juntas para que sus límites coincidan
+BOUNDARY_GROUPS = [
+    ["cantones.geojson", "parroquiasEcuador.geojson"],
+    ["ec.json"],
+]
+
+def load_features(file_path):
+    """Lee las features de un GeoJSON validado"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['features']
+
+def write_atomic(file_path, data):
+    """Escribe el GeoJSON en un temporal y lo mueve al destino para no dejar archivos a medias"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = file_path.with_suffix('.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp_path, file_path)
+
+def is_up_to_date(data_dir, filenames):
+    """Los artefactos están al día si existen y son más recientes que sus fuentes"""
+    for filename in filenames:
+        source_mtime = (data_dir / filename).stat().st_mtime
+        for level in SIMPLIFICATION_LEVELS:
+            artifact = data_dir / get_simplified_filename(filename, level)
+            if not artifact.exists() or artifact.stat().st_mtime < source_mtime:
+                return False
+    return True
+
+def build_group(data_dir, filenames, force=False):
+    """Simplifica un grupo de capas con arcos compartidos y escribe un artefacto por nivel"""
+    available = []
+    for filename in filenames:
+        is_valid, validation_msg = validate_geojson_file(data_dir / filename)
+        if is_valid:
+            available.append(filename)
+        else:
+            logger.warning(f"⚠️ Omitiendo {filename}: {validation_msg}")
+
+    if not available:
+        return 0
+    if not force and is_up_to_date(data_dir, available):
+        logger.info(f"✅ Artefactos al día para {available}")
+        return 0
+
+    features_by_file = {filename: load_features(data_dir / filename) for filename in available}
+    geometries = [
+        shape(feature['geometry']) if feature.get('geometry') else None
+        for filename in available for feature in features_by_file[filename]
+    ]
+    logger.info(f"🧩 Simplificando {len(geometries):,} geometrías de {available}...")
+
+    tolerances = [SIMPLIFICATION_LEVELS[level] for level in sorted(SIMPLIFICATION_LEVELS)]
+    simplified = simplify_shared(geometries, tolerances)
+
+    written = 0
+    for level in sorted(SIMPLIFICATION_LEVELS):
+        level_geometries = iter(simplified[SIMPLIFICATION_LEVELS[level]])
+        for filename in available:
+            features = [
+                {
+                    "type": "Feature",
+                    "properties": feature.get('properties', {}),
+                    "geometry": mapping(geom) if geom is not None else None
+                }
+                for feature, geom in zip(features_by_file[filename], level_geometries)
+            ]
+            artifact = data_dir / get_simplified_filename(filename, level)
+            write_atomic(artifact, {"type": "FeatureCollection", "features": features})
+            logger.info(f"✅ {artifact.name}: {artifact.stat().st_size:,} bytes")
+            written += 1
+    return written
+
+def main(force=False):
+    """Genera los niveles de simplificación de límites administrativos"""
+    logger.info("🚀 Generando límites simplificados...")
+    data_dir = get_data_directory()
+    if not data_dir:
+        return False
+
+    written = sum(build_group(data_dir, group, force) for group in BOUNDARY_GROUPS)
+    logger.info(f"✅ Simplificación completada ({written} artefactos escritos)")
+    return True
+
+if __name__ == "__main__":
+    success = main(force='--force' in sys.argv)
+    exit(0 if success else 1)
@@ -1,28 +1,224 @@
+"""Compresión de los GeoJSON de data/ para deployment.
+
+Minifica y comprime cada archivo en streaming (memoria acotada por CHUNK_SIZE, sin
+json.load), procesa los archivos en paralelo en varios procesos y escribe
+`compressed_manifest.json` con tamaños y sha256 que `utils.data_loader` usa para
+cargar la versión comprimida cuando falta el archivo original.
+
+Uso:
+    python compress_data.py --codec zstd --workers 4
+"""
+import argparse
 import gzip
+import hashlib
 import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from utils.data_loader import (
+    get_data_directory, COMPRESSED_MANIFEST, COMPRESSED_SUFFIXES, ZSTD_DICTIONARY
+)
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional: sin el paquete se usa gzip
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_LEVELS = {"gzip": 9, "zstd": 12}
+
+# Entrenamiento del diccionario zstd: ventanas repartidas uniformemente por cada archivo
+DICTIONARY_SIZE = 112 * 1024
+SAMPLE_SIZE = 16 * 1024
+SAMPLES_PER_FILE = 256
+JSON_WHITESPACE = b" \t\n\r"
+
+
+class JsonMinifier:
+    """Elimina los espacios fuera de cadenas JSON en flujo, chunk a chunk.
+
+    Trabaja sobre bytes UTF-8: las comillas y barras invertidas nunca forman parte
+    de un carácter multibyte, así que no hace falta decodificar.
+    """
+
+    def __init__(self):
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        out = []
+        i, n = 0, len(chunk)
+        while i < n:
+            if self.in_string:
+                if self.escape:
+                    out.append(chunk[i:i + 1])
+                    self.escape = False
+                    i += 1
+                    continue
+                quote = chunk.find(b'"', i)
+                backslash = chunk.find(b'\\', i, quote if quote >= 0 else n)
+                if backslash >= 0:
+                    out.append(chunk[i:backslash + 1])
+                    self.escape = True
+                    i = backslash + 1
+                elif quote >= 0:
+                    out.append(chunk[i:quote + 1])
+                    self.in_string = False
+                    i = quote + 1
+                else:
+                    out.append(chunk[i:])
+                    break
+            else:
+                quote = chunk.find(b'"', i)
+                if quote < 0:
+                    out.append(chunk[i:].translate(None, JSON_WHITESPACE))
+                    break
+                out.append(chunk[i:quote].translate(None, JSON_WHITESPACE))
+                out.append(b'"')
+                self.in_string = True
+                i = quote + 1
+        return b"".join(out)
+
+
+class HashingWriter:
+    """Envuelve un archivo binario contando bytes y calculando su sha256"""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def train_dictionary(files):
+    """Entrena un diccionario zstd común a la familia GeoJSON leyendo ventanas dispersas"""
+    samples = []
+    for path in files:
+        size = path.stat().st_size
+        stride = max(SAMPLE_SIZE, size // SAMPLES_PER_FILE)
+        with open(path, 'rb') as f:
+            for offset in range(0, size, stride):
+                f.seek(offset)
+                sample = f.read(SAMPLE_SIZE).translate(None, JSON_WHITESPACE)
+                if sample:
+                    samples.append(sample)
+
+    try:
+        dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, samples)
+    except zstandard.ZstdError as e:
+        logger.warning(f"⚠️ No se pudo entrenar el diccionario zstd ({len(samples)} muestras): {e}")
+        return None
+    logger.info(f"📚 Diccionario zstd entrenado con {len(samples)} muestras ({len(dictionary.as_bytes()):,} bytes)")
+    return dictionary.as_bytes()
+
+
+def compress_file(source, codec, level, dictionary=None):
+    """Minifica y comprime un archivo en streaming; devuelve su entrada del manifiesto"""
+    target = source.with_name(source.name + COMPRESSED_SUFFIXES[codec])
+    temp = target.with_name(target.name + '.tmp')
+    source_digest = hashlib.sha256()
+    minified_digest = hashlib.sha256()
+    source_size = minified_size = 0
+    minifier = JsonMinifier()
+
+    with open(source, 'rb') as src, open(temp, 'wb') as raw_out:
+        output = HashingWriter(raw_out)
+        if codec == "zstd":
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data, write_checksum=True)
+            writer = compressor.stream_writer(output, closefd=False)
+        else:
+            writer = gzip.GzipFile(fileobj=output, mode='wb', compresslevel=level, mtime=0)
+
+        with writer:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                source_digest.update(chunk)
+                source_size += len(chunk)
+                minified = minifier.feed(chunk)
+                minified_digest.update(minified)
+                minified_size += len(minified)
+                writer.write(minified)
+        raw_out.flush()
+        os.fsync(raw_out.fileno())
+
+    os.replace(temp, target)
+    return {
+        'file': target.name,
+        'codec': codec,
+        'size': output.size,
+        'sha256': output.digest.hexdigest(),
+        'source_size': source_size,
+        'source_sha256': source_digest.hexdigest(),
+        'minified_size': minified_size,
+        'minified_sha256': minified_digest.hexdigest(),
+        'dictionary': ZSTD_DICTIONARY if codec == "zstd" and dictionary else None,
+    }
+
+
+def compress_geojson_files(data_dir=None, codec="zstd", level=None, workers=None, use_dictionary=True):
+    """Comprime archivos GeoJSON grandes para deployment y escribe el manifiesto"""
+    data_dir = Path(data_dir) if data_dir else get_data_directory()
+    if codec == "zstd" and zstandard is None:
+        logger.warning("⚠️ Paquete zstandard no instalado; usando gzip")
+        codec = "gzip"
+    level = level or DEFAULT_LEVELS[codec]
+
+    files = sorted(data_dir.glob("*.geojson"))
+    if not files:
+        logger.error(f"❌ No hay archivos GeoJSON en {data_dir}")
+        return None
+
+    manifest = {'codec': codec, 'level': level, 'files': {}}
+    dictionary = None
+    if codec == "zstd" and use_dictionary:
+        dictionary = train_dictionary(files)
+        if dictionary:
+            (data_dir / ZSTD_DICTIONARY).write_bytes(dictionary)
+            manifest['dictionary'] = {
+                'file': ZSTD_DICTIONARY,
+                'sha256': hashlib.sha256(dictionary).hexdigest(),
+            }
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(compress_file, path, codec, level, dictionary): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            entry = future.result()
+            manifest['files'][path.name] = entry
+            reduction = (1 - entry['size'] / entry['source_size']) * 100 if entry['source_size'] else 0
+            logger.info(f"✅ Comprimido: {path.name} -> {entry['file']}")
+            logger.info(f"   Reducción: {reduction:.1f}% ({entry['source_size']:,} -> {entry['size']:,} bytes)")
+
+    manifest['files'] = dict(sorted(manifest['files'].items()))
+    manifest_path = data_dir / COMPRESSED_MANIFEST
+    temp = manifest_path.with_name(manifest_path.name + '.tmp')
+    temp.write_text(json.dumps(manifest, indent=2) + "\n", encoding='utf-8')
+    os.replace(temp, manifest_path)
+    logger.info(f"📝 Manifiesto escrito: {manifest_path}")
+    return manifest
 
-def compress_geojson_files():
-    """Comprime archivos GeoJSON grandes para deployment"""
-    data_dir = Path("data")
-    
-    for geojson_file in data_dir.glob("*.geojson"):
-        # Leer archivo original
-        with open(geojson_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Comprimir y guardar
-        compressed_file = geojson_file.with_suffix('.geojson.gz')
-        with gzip.open(compressed_file, 'wt', encoding='utf-8') as f:
-            json.dump(data, f, separators=(',', ':'))
-        
-        print(f"✅ Comprimido: {geojson_file.name} -> {compressed_file.name}")
-        
-        # Verificar tamaño
-        original_size = geojson_file.stat().st_size
-        compressed_size = compressed_file.stat().st_size
-        reduction = (1 - compressed_size/original_size) * 100
-        print(f"   Reducción: {reduction:.1f}% ({original_size:,} -> {compressed_size:,} bytes)")
 
 if __name__ == "__main__":
-    compress_geojson_files()
+    parser = argparse.ArgumentParser(description="Comprime los GeoJSON de data/ en streaming")
+    parser.add_argument("--data-dir", type=Path, help="Directorio de datos (por defecto el de la aplicación)")
+    parser.add_argument("--codec", choices=sorted(COMPRESSED_SUFFIXES), default="zstd")
+    parser.add_argument("--level", type=int, help="Nivel de compresión (por defecto gzip 9, zstd 12)")
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--no-dictionary", action="store_true", help="No entrenar diccionario zstd")
+    args = parser.parse_args()
+
+    compress_geojson_files(args.data_dir, args.codec, args.level, args.workers, not args.no_dictionary)
@@ -9,14 +9,39 @@ class Config:
     
     # Configuración del mapa optimizada
     GLOBAL_POINT_SIZE = 2.0
+    # Máximo de clusters por respuesta de /api/clusters (se conservan los de mayor población)
+    CLUSTER_MAX_FEATURES = 5000
+    # Máximo de hexágonos por respuesta de /api/hexbin (use una resolución más gruesa o un bbox)
+    HEX_MAX_FEATURES = 20000
+    # Máximo de coordenadas por lote de /api/locate/batch
+    LOCATE_MAX_POINTS = 100000
+    # Límites de /api/catchment: establecimientos por petición y radio máximo (km)
+    CATCHMENT_MAX_FACILITIES = 10000
+    CATCHMENT_MAX_RADIUS_KM = 200
+    # Zoom usado para elegir el nivel de simplificación de los límites dibujados
+    BOUNDARY_ZOOM = 9
     
-    # Configuración de caché
-    CACHE_TYPE = 'simple'
-    CACHE_DEFAULT_TIMEOUT = 300  # 5 minutos
+    # Configuración de caché (utils/cache_manager.py)
+    CACHE_DEFAULT_TIMEOUT = 300  # 5 minutos, para entradas sin TTL propio
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # Presupuesto global: 1 GB
+    
+    # Cache persistente de resultados (utils/result_store.py); por defecto data/cache
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '1') == '1'
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR')
     
     # Configuración de logging
     LOG_LEVEL = 'INFO'
     
+    # Precalentar imports geoespaciales y datasets en segundo plano al arrancar el worker
+    WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '0') == '1'
+    
+    # Perfilado por petición (?profile=1 o cabecera X-Profile: 1), desactivado por defecto;
+    # requiere PROFILING_TOKEN (sin token no se activa)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_INTERVAL = 0.005  # segundos entre muestras
+    PROFILING_MAX_PROFILES = 20
+    
     # Rutas de datos
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -24,6 +49,7 @@ class Config:
 class ProductionConfig(Config):
     DEBUG = False
     LOG_LEVEL = logging.WARNING
+    WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '1') == '1'
     
     # Configuración de logging para producción
     @staticmethod
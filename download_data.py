@@ -4,6 +4,9 @@ import json
 import requests
 from pathlib import Path
 import logging
+from shapely.geometry import shape, mapping
+from utils.data_loader import SIMPLIFICATION_LEVELS
+from utils.topology import simplify_shared
 
 logger = logging.getLogger(__name__)
 
@@ -28,17 +31,17 @@ def create_minimal_geojson():
                 with open(original_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 
-                # Simplificar geometrías (tomar solo cada 10mo punto para reducir tamaño)
+                # Simplificar geometrías respetando bordes compartidos (arcos simplificados una sola vez)
                 if 'features' in data:
-                    for feature in data['features'][:1000]:  # Limitar a 1000 features
-                        if 'geometry' in feature and 'coordinates' in feature['geometry']:
-                            coords = feature['geometry']['coordinates']
-                            if isinstance(coords, list) and len(coords) > 0:
-                                # Simplificar coordenadas
-                                if feature['geometry']['type'] == 'Polygon':
-                                    for ring in coords:
-                                        if len(ring) > 10:
-                                            feature['geometry']['coordinates'] = [ring[::5]]  # Cada 5to punto
+                    polygonal = [
+                        feature for feature in data['features']
+                        if (feature.get('geometry') or {}).get('type') in ('Polygon', 'MultiPolygon')
+                    ]
+                    if polygonal:
+                        tolerance = SIMPLIFICATION_LEVELS[7]
+                        geometries = simplify_shared([shape(f['geometry']) for f in polygonal], [tolerance])[tolerance]
+                        for feature, geom in zip(polygonal, geometries):
+                            feature['geometry'] = mapping(geom) if geom is not None else None
                 
                 # Guardar versión simplificada
                 with open(simplified_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,22 @@
+import sys
+import logging
+from utils.data_service import data_service
+from utils.incremental import refresh
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main(full=False):
+    """Actualiza los agregados persistidos comparando los datos con la versión anterior"""
+    try:
+        stats = refresh(data_service, full=full)
+        logger.info(f"📊 {stats.describe()}")
+        return True
+    except Exception as e:
+        # La aplicación puede recalcular al arrancar: no bloquear el despliegue
+        logger.error(f"❌ Error en el refresco incremental: {e}")
+        return False
+
+if __name__ == "__main__":
+    main(full='--full' in sys.argv)
+    sys.exit(0)
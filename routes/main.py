@@ -1,14 +1,14 @@
-from flask import Blueprint, render_template, current_app, jsonify
-import folium
-import geopandas as gpd
+from flask import Blueprint, render_template, current_app, jsonify, request
 import os
-from shapely.geometry import Point
 import json
-from functools import lru_cache
+import math
 import logging
-import pandas as pd
-from pathlib import Path
-from utils.data_loader import get_data_directory, load_geojson_with_fallback
+from utils.cache_manager import cache
+from utils.choropleth import get_population_color, build_choropleth, add_choropleth_layer
+from utils.data_loader import get_simplification_level
+from utils.data_service import data_service
+from utils.metrics import span
+from utils.tooltips import TOOLTIP_LEVELS, TOOLTIP_MAX_AGE, TOOLTIP_MAX_IDS, add_id_layer, parse_ids, tooltip_layer
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -16,230 +16,193 @@ logger = logging.getLogger(__name__)
 
 main_bp = Blueprint("main", __name__)
 
-@lru_cache(maxsize=128)
-def get_population_color(pop_value, region="continental"):
-    """Retorna color basado en la densidad de población, escala unificada para todo Ecuador"""
-    # Paleta tipo LandScan unificada para todo el territorio ecuatoriano
-    if pop_value < 5:
-        return "#0066cc", 0.3  # Azul claro - muy baja densidad
-    elif pop_value < 25:
-        return "#00aa44", 0.4  # Verde - baja densidad
-    elif pop_value < 100:
-        return "#88dd00", 0.5  # Verde claro - densidad moderada baja
-    elif pop_value < 500:
-        return "#ffff00", 0.6  # Amarillo - densidad moderada
-    elif pop_value < 1500:
-        return "#ffaa00", 0.7  # Naranja - densidad alta
-    elif pop_value < 5000:
-        return "#ff5500", 0.8  # Rojo-naranja - densidad muy alta
-    else:
-        return "#cc0000", 0.9  # Rojo intenso - densidad extrema
+def parse_bbox(value):
+    """bbox "min_lon,min_lat,max_lon,max_lat" como 4 floats finitos (ValueError si no)"""
+    bbox = [float(v) for v in value.split(',')]
+    if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox):
+        raise ValueError
+    return bbox
 
-@lru_cache(maxsize=1)
-def load_cantones_data():
-    """Carga datos de cantones con cache"""
+@main_bp.route("/api/population/bbox")
+def get_population_in_bbox():
+    """API endpoint para obtener la población dentro de un rectángulo (min_lon,min_lat,max_lon,max_lat)"""
     try:
-        return load_geojson_with_fallback("cantones.geojson", "cantones")
-    except Exception as e:
-        logger.error(f"Error cargando cantones: {e}")
-        return None
+        bbox = parse_bbox(request.args.get('bbox', ''))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parámetro bbox inválido, use bbox=min_lon,min_lat,max_lon,max_lat'
+        }), 400
+    try:
+        resolution = float(request.args['resolution']) if request.args.get('resolution') else None
+        if resolution is not None and not (math.isfinite(resolution) and resolution > 0):
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parámetro resolution inválido, use un tamaño de celda positivo en grados'
+        }), 400
 
-@lru_cache(maxsize=1)
-def load_ecuador_boundaries():
-    """Carga fronteras de Ecuador con cache"""
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DATA_DIR = os.path.join(BASE_DIR, "..", "data")
-    ecuador_path = os.path.join(DATA_DIR, "ec.json")
-    
     try:
-        gdf_ecuador = gpd.read_file(ecuador_path)
-        return gdf_ecuador, gdf_ecuador.geometry.unary_union
+        grid = data_service.load_population_grid()
+        if grid is None:
+            return jsonify({
+                'success': False,
+                'error': 'Datos de población no disponibles'
+            }), 503
+
+        total = int(round(grid.rectangle_total(*bbox, resolution=resolution)))
+        return jsonify({
+            'success': True,
+            'data': {
+                'bbox': bbox,
+                'population': total,
+                'formatted_population': f"{total:,}".replace(',', '.'),
+                'resolution': grid.select(resolution).cell_size
+            }
+        })
     except Exception as e:
-        logger.error(f"Error cargando fronteras: {e}")
-        return None, None
+        logger.error(f"Error en API población por bbox: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-@lru_cache(maxsize=1)
-def load_all_population_data():
-    """Carga TODOS los datos de población REALISTAS para cálculos precisos"""
+@main_bp.route("/api/clusters")
+def get_population_clusters():
+    """API endpoint con los clusters de población de la vista (bbox=min_lon,min_lat,max_lon,max_lat&zoom=z)"""
     try:
-        return load_geojson_with_fallback("poblacion_ecuador_realistic.geojson", "población completa")
-    except Exception as e:
-        logger.error(f"❌ Error cargando datos realistas: {e}")
-        return None
-    logger.info("🎯 Cargando datos REALISTAS de población...")
-    gdf_poblacion = gpd.read_file(poblacion_path)
-    
-    # Cargar fronteras para filtrado
-    gdf_ecuador, ecuador_union = load_ecuador_boundaries()
-    if gdf_ecuador is None:
-        logger.warning("No se pudieron cargar fronteras de Ecuador")
-        return gdf_poblacion  # Usar todos los datos sin filtro espacial
-        
-    # Asegurar mismo CRS
-    if gdf_poblacion.crs != gdf_ecuador.crs:
-        gdf_poblacion = gdf_poblacion.to_crs(gdf_ecuador.crs)
-    
-    # Filtrar espacialmente (SIN LÍMITE DE PUNTOS)
-    logger.info("Filtrando puntos dentro de Ecuador...")
-    gdf_filtrada = gdf_poblacion[
-        gdf_poblacion.within(ecuador_union) | 
-        gdf_poblacion.intersects(ecuador_union)
-    ]
-    
-    # Estadísticas de los datos cargados
-    total_population = gdf_filtrada['population'].sum()
-    logger.info(f"✅ DATOS REALISTAS cargados: {len(gdf_filtrada):,} puntos")
-    logger.info(f"🏘️  Población total REALISTA: {total_population:,.0f} habitantes")
-    logger.info(f"📊 Rango de población: {gdf_filtrada['population'].min():.1f} - {gdf_filtrada['population'].max():.1f}")
-    
-    return gdf_filtrada
-
-@lru_cache(maxsize=1)
-def load_population_data():
-    """Carga datos de población para renderizado con muchos más puntos para visualización tipo LandScan"""
-    # Obtener todos los datos primero
-    gdf_all_population = load_all_population_data()
-    if gdf_all_population is None:
-        return None
-    
+        bbox = parse_bbox(request.args.get('bbox', ''))
+        zoom = float(request.args.get('zoom', ''))
+        if not math.isfinite(zoom):
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parámetros inválidos, use bbox=min_lon,min_lat,max_lon,max_lat&zoom=z'
+        }), 400
+
     try:
-        # Usar menos puntos en producción para mejor rendimiento
-        if os.environ.get('RAILWAY_ENVIRONMENT'):
-            max_points = 25000  # Reducido para Railway
-        else:
-            max_points = 50000  # Valor para desarrollo local
-        
-        # Estrategia mixta: combinar puntos de alta y baja población para mejor cobertura
-        gdf_high = gdf_all_population.sort_values('population', ascending=False)
-        gdf_low = gdf_all_population.sort_values('population', ascending=True)
-        
-        # Tomar 70% de puntos con mayor población y 30% distribuidos aleatoriamente
-        high_count = int(max_points * 0.7)
-        remaining_count = max_points - high_count
-        
-        if len(gdf_all_population) > max_points:
-            # Puntos de alta población
-            selected_high = gdf_high.head(high_count)
-            
-            # Puntos adicionales para cobertura espacial (excluir los ya seleccionados)
-            remaining_points = gdf_all_population[~gdf_all_population.index.isin(selected_high.index)]
-            
-            if len(remaining_points) > remaining_count:
-                # Seleccionar aleatoriamente para mejor distribución espacial
-                selected_low = remaining_points.sample(n=remaining_count, random_state=42)
-            else:
-                selected_low = remaining_points
-            
-            # Combinar ambos conjuntos
-            gdf_for_map = pd.concat([selected_high, selected_low])
-            
-            logger.info(f"Estrategia mixta: {len(selected_high)} puntos altos + {len(selected_low)} puntos distribuidos")
-        else:
-            gdf_for_map = gdf_all_population
-            logger.info("Usando todos los puntos disponibles")
-        
-        logger.info(f"📍 Puntos de población para MAPA: {len(gdf_for_map):,} (tipo LandScan)")
-        return gdf_for_map
-        
+        index = data_service.load_cluster_index()
+        if index is None:
+            return jsonify({
+                'success': False,
+                'error': 'Datos de población no disponibles'
+            }), 503
+
+        max_features = current_app.config.get('CLUSTER_MAX_FEATURES', 5000)
+        features, truncated = index.cluster_features(bbox, zoom, max_features)
+        for feature in features:
+            properties = feature['properties']
+            # Color según la población media por punto (misma escala que los puntos individuales)
+            color, opacity = get_population_color(properties['population'] / properties['point_count'])
+            properties.update({
+                'color': color,
+                'opacity': opacity,
+                'formatted_population': f"{properties['population']:,}".replace(',', '.'),
+            })
+
+        # json.dumps compacto: jsonify indenta en modo debug (codificador en Python puro)
+        payload = json.dumps({
+            'success': True,
+            'data': {
+                'type': 'FeatureCollection',
+                'features': features,
+                'truncated': truncated
+            }
+        }, separators=(',', ':'))
+        return current_app.response_class(payload, mimetype='application/json')
     except Exception as e:
-        logger.error(f"Error preparando datos para mapa: {e}")
+        logger.error(f"Error en API clusters de población: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def color_hex_features(features):
+    """Agrega color, opacidad y población formateada a features de hexágonos (en su lugar)"""
+    for feature in features:
+        properties = feature['properties']
+        color, opacity = get_population_color(properties['density'])
+        properties.update({
+            'color': color,
+            'opacity': opacity,
+            'formatted_population': f"{properties['population']:,}".replace(',', '.'),
+        })
+    return features
+
+@cache.cached("main.hexbin_features", maxsize=8, groups=("cantones", "parroquias"))
+def hexbin_features(resolution):
+    """Features GeoJSON coloreadas por densidad de una resolución completa (cache por resolución)"""
+    grids = data_service.load_hex_grids()
+    if grids is None:
         return None
+    return color_hex_features(grids[resolution].features())
 
-@lru_cache(maxsize=1)
-def calculate_population_by_canton():
-    """Calcula la población total por cantón usando TODOS los puntos (sin límite)"""
+@main_bp.route("/api/hexbin")
+def get_population_hexbin():
+    """API endpoint con la población por hexágono (resolution=lado en km, bbox opcional)"""
     try:
-        logger.info("Calculando población por cantón usando TODOS los datos...")
-        
-        # Cargar datos - USAR TODOS LOS PUNTOS, NO LOS LIMITADOS
-        gdf_cantones = load_cantones_data()
-        gdf_poblacion = load_all_population_data()  # ¡CAMBIO IMPORTANTE!
-        
-        if gdf_cantones is None or gdf_poblacion is None:
-            logger.warning("No se pudieron cargar los datos necesarios")
-            return []
-        
-        # Asegurar mismo CRS
-        if gdf_cantones.crs != gdf_poblacion.crs:
-            gdf_cantones = gdf_cantones.to_crs(gdf_poblacion.crs)
-        
-        # Crear diccionario para almacenar población por cantón
-        canton_population = {}
-        
-        logger.info(f"Procesando {len(gdf_cantones)} cantones con {len(gdf_poblacion)} puntos de población COMPLETOS")
-        
-        # Optimización: crear un índice espacial para acelerar las consultas
-        from shapely.strtree import STRtree
-        
-        # Crear índice espacial para los puntos de población
-        population_geoms = list(gdf_poblacion.geometry)
-        population_tree = STRtree(population_geoms)
-        
-        # Para cada cantón, calcular la suma de población de puntos que intersectan
-        for idx, canton in gdf_cantones.iterrows():
-            canton_name = canton.get('DPA_DESCAN', f'Canton_{idx}')
-            canton_geom = canton.geometry
-            
-            try:
-                # Usar el índice espacial para encontrar candidatos cercanos
-                possible_matches_idx = list(population_tree.query(canton_geom))
-                
-                if possible_matches_idx:
-                    # Filtrar solo los que realmente intersectan
-                    candidate_points = gdf_poblacion.iloc[possible_matches_idx]
-                    points_in_canton = candidate_points[candidate_points.geometry.intersects(canton_geom)]
-                    
-                    # Sumar la población
-                    total_population = points_in_canton['population'].sum() if len(points_in_canton) > 0 else 0
-                else:
-                    total_population = 0
-                
-                canton_population[canton_name] = {
-                    'name': canton_name,
-                    'population': int(total_population),
-                    'formatted_population': f"{int(total_population):,}".replace(',', '.'),
-                    'points_count': len(candidate_points) if possible_matches_idx else 0  # Para debugging
-                }
-                
-                # Log para los cantones más poblados
-                if total_population > 50000:
-                    logger.info(f"Cantón {canton_name}: {int(total_population):,} habitantes ({len(candidate_points) if possible_matches_idx else 0} puntos)")
-                
-            except Exception as e:
-                logger.warning(f"Error procesando cantón {canton_name}: {e}")
-                canton_population[canton_name] = {
-                    'name': canton_name,
-                    'population': 0,
-                    'formatted_population': '0',
-                    'points_count': 0
-                }
-        
-        # Convertir a lista y ordenar por población (mayor a menor)
-        population_list = list(canton_population.values())
-        population_list.sort(key=lambda x: x['population'], reverse=True)
-        
-        # Log del resumen
-        total_calculated = sum(item['population'] for item in population_list)
-        logger.info(f"Población calculada para {len(population_list)} cantones")
-        logger.info(f"Población total calculada: {total_calculated:,} habitantes")
-        
-        # Log top 5 cantones
-        top_5_info = [f"{item['name']}: {item['population']:,}" for item in population_list[:5]]
-        logger.info(f"Top 5 cantones: {top_5_info}")
-        
-        return population_list
-        
+        resolution = int(request.args.get('resolution', 10))
+        bbox = parse_bbox(request.args['bbox']) if request.args.get('bbox') else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parámetros inválidos, use resolution=<km>&bbox=min_lon,min_lat,max_lon,max_lat'
+        }), 400
+
+    try:
+        # numpy/utils.hexbin se cargan con las mallas: el módulo de rutas no los importa
+        grids = data_service.load_hex_grids()
+        if grids is None:
+            return jsonify({
+                'success': False,
+                'error': 'Datos de población no disponibles'
+            }), 503
+        if resolution not in grids:
+            return jsonify({
+                'success': False,
+                'error': f"Resolución no disponible, use una de: {', '.join(map(str, grids))} km"
+            }), 400
+
+        # Validar el tamaño antes de construir features: un rechazo no genera ni cachea nada
+        grid = grids[resolution]
+        count = len(grid) if bbox is None else len(grid.select(bbox))
+        max_features = current_app.config.get('HEX_MAX_FEATURES', 20000)
+        if count > max_features:
+            return jsonify({
+                'success': False,
+                'error': f"{count:,} hexágonos exceden el máximo ({max_features:,}); "
+                         "use una resolución más gruesa o un bbox menor"
+            }), 400
+
+        if bbox is None:
+            features = hexbin_features(resolution)
+        else:
+            features = color_hex_features(grid.features(bbox))
+
+        payload = json.dumps({
+            'success': True,
+            'data': {
+                'type': 'FeatureCollection',
+                'features': features,
+                'resolution': resolution,
+                'area_km2': round(grid.area_km2, 3)
+            }
+        }, separators=(',', ':'))
+        return current_app.response_class(payload, mimetype='application/json')
     except Exception as e:
-        logger.error(f"Error calculando población por cantón: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        logger.error(f"Error en API hexágonos de población: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @main_bp.route("/api/population-by-canton")
 def get_population_by_canton():
     """API endpoint para obtener datos de población por cantón"""
     try:
-        population_data = calculate_population_by_canton()
+        population_data = data_service.calculate_population_by_canton()
         return jsonify({
             'success': True,
             'data': population_data
@@ -251,79 +214,368 @@ def get_population_by_canton():
             'error': str(e)
         }), 500
 
+@main_bp.route("/api/tooltips/<level>")
+def get_tooltips(level):
+    """API endpoint con el contenido de los tooltips por código de unidad (ids=1,2,3), en lotes"""
+    if level not in TOOLTIP_LEVELS:
+        return jsonify({
+            'success': False,
+            'error': f"Nivel no disponible, use uno de: {', '.join(TOOLTIP_LEVELS)}"
+        }), 404
+    try:
+        ids = parse_ids(request.args.get('ids', ''))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': f'Parámetro ids inválido, use ids=1,2,3 (máximo {TOOLTIP_MAX_IDS} por petición)'
+        }), 400
+
+    try:
+        table = data_service.load_tooltip_table(level)
+        data = {
+            code: {'name': table[code][0], 'formatted_population': table[code][1]}
+            for code in ids if code in table
+        }
+        payload = json.dumps({'success': True, 'data': data}, separators=(',', ':'), ensure_ascii=False)
+        response = current_app.response_class(payload, mimetype='application/json')
+        # Cacheable por URL (los ids van ordenados desde el navegador); el ETag permite revalidar con 304
+        response.headers['Cache-Control'] = f'public, max-age={TOOLTIP_MAX_AGE}'
+        response.add_etag()
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error en API tooltips de {level}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main_bp.route("/api/locate")
+def locate_point():
+    """API endpoint de geocodificación inversa de un punto (lat=&lon=)"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Parámetros inválidos, use lat=<grados>&lon=<grados>'
+        }), 400
+
+    try:
+        locator = data_service.load_unit_locator()
+        if locator is None:
+            return jsonify({
+                'success': False,
+                'error': 'Parroquias no disponibles'
+            }), 503
+
+        position = int(locator.locate([lon], [lat])[0])
+        return jsonify({
+            'success': True,
+            'data': {'lat': lat, 'lon': lon, 'unit': locator.describe(position)}
+        })
+    except Exception as e:
+        logger.error(f"Error en API de geocodificación: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def parse_locate_batch():
+    """Coordenadas (lons, lats) del cuerpo de /api/locate/batch; ValueError si es inválido.
+
+    JSON: {"points": [[lon, lat], ...]} o {"lons": [...], "lats": [...]}.
+    Binario (application/octet-stream): pares lon, lat en float64 little-endian
+    (float32 con ?dtype=float32).
+    """
+    import numpy as np
+    if request.mimetype == 'application/octet-stream':
+        dtype = {'float64': '<f8', 'float32': '<f4'}.get(request.args.get('dtype', 'float64'))
+        body = request.get_data(cache=False)
+        if dtype is None or len(body) % (2 * np.dtype(dtype).itemsize):
+            raise ValueError
+        coords = np.frombuffer(body, dtype=dtype).astype(np.float64).reshape(-1, 2)
+        lons, lats = coords[:, 0], coords[:, 1]
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError
+        if 'points' in data:
+            coords = np.asarray(data['points'], dtype=np.float64)
+            if coords.size == 0:
+                coords = coords.reshape(0, 2)
+            # Sin reshape: una lista plana o de ternas no se reinterpreta como pares
+            if coords.ndim != 2 or coords.shape[1] != 2:
+                raise ValueError
+            lons, lats = coords[:, 0], coords[:, 1]
+        else:
+            lons = np.asarray(data['lons'], dtype=np.float64)
+            lats = np.asarray(data['lats'], dtype=np.float64)
+            if lons.ndim != 1 or lons.shape != lats.shape:
+                raise ValueError
+
+    if not (np.all(np.abs(lats) <= 90) and np.all(np.abs(lons) <= 180)):
+        raise ValueError
+    return lons, lats
+
+@main_bp.route("/api/locate/batch", methods=["POST"])
+def locate_batch():
+    """API endpoint de geocodificación inversa en lote (JSON o binario, ver parse_locate_batch).
+
+    Con ?format=binary responde un registro de 4 int32 little-endian por punto
+    (parroquia, cantón, provincia, clase de densidad; -1 si no hay unidad); en JSON,
+    las mismas columnas y la descripción de cada parroquia encontrada en `units`.
+    """
+    max_points = current_app.config.get('LOCATE_MAX_POINTS', 100000)
+    if request.content_length and request.content_length > max_points * 64:
+        return jsonify({
+            'success': False,
+            'error': f"Lote demasiado grande (máximo {max_points:,} puntos)"
+        }), 413
+    try:
+        lons, lats = parse_locate_batch()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Cuerpo inválido, envíe {"points": [[lon, lat], ...]}, {"lons": [...], "lats": [...]} '
+                     'o pares lon, lat en float64 (application/octet-stream)'
+        }), 400
+    if len(lons) > max_points:
+        return jsonify({
+            'success': False,
+            'error': f"{len(lons):,} puntos exceden el máximo ({max_points:,}) por lote"
+        }), 413
+
+    try:
+        locator = data_service.load_unit_locator()
+        if locator is None:
+            return jsonify({
+                'success': False,
+                'error': 'Parroquias no disponibles'
+            }), 503
+
+        with span("locate_batch"):
+            positions = locator.locate(lons, lats)
+            records = locator.records(positions)
+        found = int((positions >= 0).sum())
+
+        if request.args.get('format') == 'binary':
+            response = current_app.response_class(records.tobytes(), mimetype='application/octet-stream')
+            response.headers['X-Record-Fields'] = ','.join(records.dtype.names)
+            response.headers['X-Record-Count'] = str(len(records))
+            response.headers['X-Found-Count'] = str(found)
+            return response
+
+        payload = json.dumps({
+            'success': True,
+            'data': {
+                'count': len(records),
+                'found': found,
+                **{field: records[field].tolist() for field in records.dtype.names},
+                'units': locator.legend(positions),
+            }
+        }, separators=(',', ':'), ensure_ascii=False)
+        return current_app.response_class(payload, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"Error en API de geocodificación en lote: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def parse_facilities(data, max_radius):
+    """(lons, lats, radios en km) de los establecimientos de /api/catchment; ValueError si son inválidos.
+
+    Acepta {"facilities": [{"lon": .., "lat": .., "radius_km": ..}, ...]} o
+    {"lons": [...], "lats": [...], "radius_km": <km o lista>}.
+    """
+    import numpy as np
+    if not isinstance(data, dict):
+        raise ValueError
+    if 'facilities' in data:
+        facilities = data['facilities']
+        lons = np.array([f['lon'] for f in facilities], dtype=np.float64)
+        lats = np.array([f['lat'] for f in facilities], dtype=np.float64)
+        radii = np.array([f.get('radius_km', data.get('radius_km')) for f in facilities], dtype=np.float64)
+    else:
+        lons = np.asarray(data['lons'], dtype=np.float64)
+        lats = np.asarray(data['lats'], dtype=np.float64)
+        radii = np.broadcast_to(np.asarray(data['radius_km'], dtype=np.float64), lons.shape)
+
+    if lons.ndim != 1 or lons.shape != lats.shape or radii.shape != lons.shape:
+        raise ValueError
+    if not (np.all(np.abs(lats) <= 90) and np.all(np.abs(lons) <= 180)
+            and np.all(radii > 0) and np.all(radii <= max_radius)):
+        raise ValueError
+    return lons, lats, radii
+
+@main_bp.route("/api/catchment", methods=["POST"])
+def get_catchment():
+    """API endpoint de áreas de cobertura: población a menos de un radio de cada establecimiento
+    y total cubierto, contando una sola vez la población de las superposiciones"""
+    max_facilities = current_app.config.get('CATCHMENT_MAX_FACILITIES', 10000)
+    max_radius = current_app.config.get('CATCHMENT_MAX_RADIUS_KM', 200)
+    try:
+        lons, lats, radii = parse_facilities(request.get_json(silent=True), max_radius)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Cuerpo inválido, envíe {"facilities": [{"lon": .., "lat": .., "radius_km": ..}, ...]} '
+                     f'o {{"lons": [...], "lats": [...], "radius_km": ..}} con radios de hasta {max_radius} km'
+        }), 400
+    if len(lons) > max_facilities:
+        return jsonify({
+            'success': False,
+            'error': f"{len(lons):,} establecimientos exceden el máximo ({max_facilities:,}) por petición"
+        }), 413
+
+    try:
+        from utils.catchment import catchment
+        index = data_service.load_cluster_index()
+        if index is None:
+            return jsonify({
+                'success': False,
+                'error': 'Datos de población no disponibles'
+            }), 503
+
+        with span("catchment"):
+            population, counts, covered, covered_points = catchment(index.points, lons, lats, radii)
+        overlap = int(round(population.sum() - covered))
+        population = [int(round(p)) for p in population.tolist()]
+        total = int(round(covered))
+
+        payload = json.dumps({
+            'success': True,
+            'data': {
+                'count': len(population),
+                'population': population,
+                'points_count': counts.tolist(),
+                'total_population': total,
+                'formatted_total_population': f"{total:,}".replace(',', '.'),
+                'total_points': covered_points,
+                # Población contada más de una vez al sumar los establecimientos por separado
+                'overlap_population': overlap,
+            }
+        }, separators=(',', ':'))
+        return current_app.response_class(payload, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"Error en API de áreas de cobertura: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@main_bp.route("/api/stats/<level>")
+def get_unit_stats(level):
+    """API endpoint con la tabla de estadísticas por unidad (columns=a,b,c; format=json|csv|parquet)"""
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'csv', 'parquet'):
+        return jsonify({
+            'success': False,
+            'error': 'Formato no disponible, use format=json, csv o parquet'
+        }), 400
+
+    try:
+        tables = data_service.load_unit_stats()
+        if tables is None:
+            return jsonify({
+                'success': False,
+                'error': 'Datos de población no disponibles'
+            }), 503
+        if level not in tables:
+            return jsonify({
+                'success': False,
+                'error': f"Nivel no disponible, use uno de: {', '.join(tables)}"
+            }), 404
+
+        table = tables[level]
+        if request.args.get('columns'):
+            columns = [c.strip() for c in request.args['columns'].split(',') if c.strip()]
+            unknown = [c for c in columns if c not in table.columns]
+            if unknown or not columns:
+                return jsonify({
+                    'success': False,
+                    'error': f"Columnas no disponibles: {', '.join(unknown)}; use: {', '.join(table.columns)}"
+                }), 400
+            table = table[columns]
+
+        filename = f"estadisticas_{level}.{output}"
+        if output == 'csv':
+            response = current_app.response_class(table.to_csv(index=False), mimetype='text/csv')
+        elif output == 'parquet':
+            try:
+                import pyarrow  # noqa: F401 - dependencia opcional, solo para format=parquet
+            except ImportError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Parquet no disponible: instale pyarrow o use format=csv'
+                }), 501
+            response = current_app.response_class(table.to_parquet(index=False), mimetype='application/vnd.apache.parquet')
+        else:
+            # Columnar: una lista por columna; NaN -> null
+            payload = json.dumps({
+                'success': True,
+                'data': {
+                    'count': len(table),
+                    'columns': {
+                        column: table[column].astype(object).where(table[column].notna(), None).tolist()
+                        for column in table.columns
+                    }
+                }
+            }, separators=(',', ':'), ensure_ascii=False)
+            return current_app.response_class(payload, mimetype='application/json')
+
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    except Exception as e:
+        logger.error(f"Error en API de estadísticas de {level}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 def add_cantones_to_map(map_obj):
-    """Agrega cantones al mapa con información de población en tooltips"""
-    gdf_cantones = load_cantones_data()
+    """Agrega cantones al mapa en una sola capa; los tooltips se piden a /api/tooltips/cantones.
+
+    Devuelve el nombre JavaScript de la capa (None si no hay límites).
+    """
+    zoom = current_app.config.get('BOUNDARY_ZOOM', 9)
+    gdf_cantones = data_service.load_cantones_boundaries(get_simplification_level(zoom))
     if gdf_cantones is None:
-        return
-        
-    # Obtener datos de población por cantón
-    population_data = calculate_population_by_canton()
-    population_dict = {item['name']: item for item in population_data}
-        
+        return None
+
     logger.info("Agregando cantones al mapa...")
-    
-    # Crear geojson con tooltips personalizados
-    def style_function(feature):
-        return {
-            "fillColor": "transparent",
-            "color": "black",
-            "weight": 1,
-            "fillOpacity": 0,
-        }
-    
-    # Agregar cada cantón con tooltip personalizado
-    for _, canton in gdf_cantones.iterrows():
-        canton_name = canton['DPA_DESCAN']
-        population_info = population_dict.get(canton_name, {'formatted_population': 'No disponible'})
-        
-        folium.GeoJson(
-            canton.geometry,
-            style_function=style_function,
-            tooltip=f"""
-            <div style="font-family: Arial, sans-serif; min-width: 150px;">
-                <b>Cantón:</b> {canton_name}<br>
-                <b>Habitantes:</b> {population_info['formatted_population']}
-            </div>
-            """
-        ).add_to(map_obj)
-
-def add_population_to_map(map_obj):
-    """Agrega puntos de población al mapa de forma optimizada"""
-    gdf_poblacion = load_population_data()
-    if gdf_poblacion is None:
-        return
-        
-    logger.info("Agregando puntos de población al mapa...")
-    
-    # Crear grupo de capas
-    poblacion_group = folium.FeatureGroup(name="Densidad de Población")
-    
-    # Optimización: crear todos los marcadores en batch
-    for _, row in gdf_poblacion.iterrows():
-        pop_value = row.get('population', 0)
-        region = row.get('region', 'continental')
-        color, opacity = get_population_color(pop_value, region)
-        
-        # Usar tamaño pequeño tipo LandScan para mejor visualización de densidad
-        radius = current_app.config.get('GLOBAL_POINT_SIZE', 1.5)  # Reducido para más parecido a LandScan
-        
-        folium.CircleMarker(
-            location=[row.geometry.y, row.geometry.x],
-            radius=radius,
-            color=color,
-            fill=True,
-            fillColor=color,
-            fillOpacity=opacity,
-            weight=0.2,  # Bordes más delgados para parecer más al LandScan
-        ).add_to(poblacion_group)
-    
-    poblacion_group.add_to(map_obj)
+    return add_id_layer(map_obj, gdf_cantones, "Cantones", {
+        "fillColor": "transparent",
+        "color": "black",
+        "weight": 1,
+        "fillOpacity": 0,
+    })
+
+@cache.cached("main.build_cantones_choropleth", maxsize=8, groups=("cantones",))
+def build_cantones_choropleth(level):
+    """Coropletas de densidad por cantón desde los agregados cacheados (cache por nivel)"""
+    gdf_cantones = data_service.load_cantones_boundaries(level)
+    if gdf_cantones is None:
+        return None
+    return build_choropleth(
+        gdf_cantones,
+        data_service.calculate_population_by_canton(),
+        data_service.load_unit_areas('cantones'),
+        'DPA_DESCAN'
+    )
 
 @main_bp.route("/")
 def mapa():
     """Ruta principal optimizada para mejor rendimiento"""
+    # Importación diferida: folium (y pandas/branca) solo se cargan al renderizar
+    import folium
+    from utils.hexbin import population_layers
     logger.info("Generando mapa...")
+    coropletas = request.args.get('modo') == 'coropletas'
+    capa_tooltips = None
     
     # Crear mapa con configuración optimizada
     m = folium.Map(
@@ -334,12 +586,19 @@ def mapa():
     )
     
     try:
-        # Agregar cantones
-        add_cantones_to_map(m)
-        
-        # Agregar población
-        add_population_to_map(m)
-        
+        if coropletas:
+            # ?modo=coropletas: cantones rellenos por densidad, en una sola capa
+            with span("folium_choropleth"):
+                zoom = current_app.config.get('BOUNDARY_ZOOM', 9)
+                collection = build_cantones_choropleth(get_simplification_level(zoom))
+                if collection is not None:
+                    add_choropleth_layer(m, collection, "Cantón")
+        # Agregar cantones (con ?limites=topojson el navegador los dibuja desde /api/boundaries/topojson)
+        elif request.args.get('limites') != 'topojson':
+            with span("folium_cantones"):
+                capa_tooltips = add_cantones_to_map(m)
+        
+        # La población se dibuja en el navegador desde /api/clusters (ver layout.html)
         logger.info("Mapa generado exitosamente!")
         
     except Exception as e:
@@ -347,25 +606,29 @@ def mapa():
         import traceback
         traceback.print_exc()
 
-    return render_template(
-        "index.html",
-        mapa=m.get_root().render(),
-        map_name=m.get_name(),
-        ruta_activa="mapa"
-    )
+    with span("folium_render"):
+        mapa_html = m.get_root().render()
+
+    with span("template"):
+        return render_template(
+            "index.html",
+            mapa=mapa_html,
+            map_name=m.get_name(),
+            ruta_activa="mapa",
+            capa_limites="cantones" if request.args.get('limites') == 'topojson' else None,
+            # ?hex=<km> reemplaza los clusters por la capa hexagonal de esa resolución
+            **population_layers(request.args.get('hex'), coropletas),
+            capa_tooltips=tooltip_layer(capa_tooltips, 'cantones')
+        )
 
 @main_bp.route("/api/clear-cache")
 def clear_cache():
     """Endpoint para limpiar cache y recalcular datos"""
     try:
-        # Limpiar cache de las funciones principales
-        load_all_population_data.cache_clear()
-        load_population_data.cache_clear()
-        calculate_population_by_canton.cache_clear()
-        load_cantones_data.cache_clear()
-        load_ecuador_boundaries.cache_clear()
+        # Limpiar las cachés (memoria y disco) del grupo de cantones
+        cleared = data_service.clear(group="cantones")
         
-        logger.info("Cache limpiado exitosamente")
+        logger.info(f"Cache limpiado exitosamente: {cleared}")
         return jsonify({
             'success': True,
             'message': 'Cache limpiado. Los datos se recalcularán en la próxima consulta.'
@@ -377,135 +640,6 @@ def clear_cache():
             'error': str(e)
         }), 500
 
-def load_geojson_safe(file_path, description="archivo"):
-    """Carga un archivo GeoJSON de manera segura con múltiples intentos"""
-    try:
-        # Convertir a Path para mejor manejo
-        path = Path(file_path)
-        
-        # Verificar que el archivo existe
-        if not path.exists():
-            logger.error(f"❌ Archivo no encontrado: {path}")
-            return None
-            
-        # Verificar tamaño del archivo
-        if path.stat().st_size == 0:
-            logger.error(f"❌ Archivo vacío: {path}")
-            return None
-            
-        logger.info(f"📁 Intentando cargar {description}: {path}")
-        
-        # Método 1: Intentar con geopandas directamente
-        try:
-            gdf = gpd.read_file(str(path))
-            logger.info(f"✅ {description} cargado exitosamente con geopandas")
-            return gdf
-        except Exception as e1:
-            logger.warning(f"⚠️ Fallo método 1 (geopandas): {e1}")
-            
-        # Método 2: Intentar especificando driver
-        try:
-            gdf = gpd.read_file(str(path), driver='GeoJSON')
-            logger.info(f"✅ {description} cargado exitosamente con driver GeoJSON")
-            return gdf
-        except Exception as e2:
-            logger.warning(f"⚠️ Fallo método 2 (driver GeoJSON): {e2}")
-            
-        # Método 3: Intentar leyendo como JSON y convirtiendo
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                geojson_data = json.load(f)
-            gdf = gpd.GeoDataFrame.from_features(geojson_data['features'])
-            logger.info(f"✅ {description} cargado exitosamente como JSON")
-            return gdf
-        except Exception as e3:
-            logger.warning(f"⚠️ Fallo método 3 (JSON): {e3}")
-            
-        # Método 4: Intentar con diferentes codificaciones
-        for encoding in ['utf-8', 'latin-1', 'cp1252']:
-            try:
-                with open(path, 'r', encoding=encoding) as f:
-                    geojson_data = json.load(f)
-                gdf = gpd.GeoDataFrame.from_features(geojson_data['features'])
-                logger.info(f"✅ {description} cargado exitosamente con codificación {encoding}")
-                return gdf
-            except Exception as e4:
-                continue
-                
-        logger.error(f"❌ No se pudo cargar {description} con ningún método")
-        return None
-        
-    except Exception as e:
-        logger.error(f"❌ Error inesperado cargando {description}: {e}")
-        return None
-
-def generate_map():
-    try:
-        logger.info("Generando mapa...")
-        
-        # Definir rutas base
-        base_dir = Path(__file__).parent.parent
-        data_dir = base_dir / "data"
-        
-        logger.info(f"📁 Directorio base: {base_dir}")
-        logger.info(f"📁 Directorio de datos: {data_dir}")
-        
-        # Listar archivos disponibles
-        if data_dir.exists():
-            files = list(data_dir.glob("*.geojson"))
-            logger.info(f"📋 Archivos GeoJSON encontrados: {[f.name for f in files]}")
-        else:
-            logger.error(f"❌ Directorio de datos no existe: {data_dir}")
-            return None
-        
-        # Cargar cantones
-        cantones_path = data_dir / "cantones.geojson"
-        cantones_gdf = load_geojson_safe(cantones_path, "cantones")
-        
-        if cantones_gdf is None:
-            logger.error("❌ No se pudieron cargar los cantones")
-            return None
-            
-        # ...existing code for map generation...
-        
-    except Exception as e:
-        logger.error(f"❌ Error generando mapa: {e}")
-        return None
-
-def load_population_data():
-    """Carga datos de población con múltiples fallbacks"""
-    try:
-        base_dir = Path(__file__).parent.parent
-        data_dir = base_dir / "data"
-        
-        # Lista de archivos en orden de preferencia
-        population_files = [
-            "poblacion_ecuador_realistic.geojson",
-            "poblacion_ecuador_calibrated.geojson", 
-            "poblacion_ecuador_enhanced.geojson",
-            "poblacion_ecuador.geojson"
-        ]
-        
-        for filename in population_files:
-            file_path = data_dir / filename
-            logger.info(f"🎯 Intentando cargar: {filename}")
-            
-            population_gdf = load_geojson_safe(file_path, f"población ({filename})")
-            if population_gdf is not None:
-                logger.info(f"✅ Datos de población cargados desde: {filename}")
-                return population_gdf
-                
-        logger.error("❌ No se pudieron cargar datos de población desde ningún archivo")
-        return None
-        
-    except Exception as e:
-        logger.error(f"❌ Error cargando datos de población: {e}")
-        return None
-
-@main_bp.route('/')
-def index():
-    return render_template('index.html')
-
 @main_bp.route('/api/cantones')
 def get_cantones():
     try:
@@ -0,0 +1,129 @@
+from flask import Blueprint, render_template, current_app, jsonify, request
+import logging
+from utils.cache_manager import cache
+from utils.choropleth import build_choropleth, add_choropleth_layer
+from utils.data_loader import get_simplification_level
+from utils.data_service import data_service
+from utils.metrics import span
+from utils.tooltips import add_id_layer, tooltip_layer
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+provincias_bp = Blueprint("provincias", __name__)
+
+@provincias_bp.route("/api/population-by-provincia")
+def get_population_by_provincia():
+    """API endpoint con la población por provincia (suma de los agregados de cantones)"""
+    try:
+        population_data = data_service.calculate_population_by_provincia()
+        return jsonify({
+            'success': True,
+            'data': population_data
+        })
+    except Exception as e:
+        logger.error(f"Error en API población por provincia: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@provincias_bp.route("/api/provincias")
+def get_provincias():
+    """API endpoint con los nombres de provincias por código DPA"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': data_service.load_provincia_names()
+        })
+    except Exception as e:
+        logger.error(f"Error en API de provincias: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def load_provincias_boundaries(level):
+    """Límites de provincias del nivel de simplificación pedido (None si no hay cantones)"""
+    boundaries = data_service.load_provincias_boundaries()
+    return boundaries.get(level) if boundaries else None
+
+def add_provincias_to_map(map_obj):
+    """Agrega provincias al mapa en una sola capa; tooltips desde /api/tooltips/provincias"""
+    zoom = current_app.config.get('BOUNDARY_ZOOM', 9)
+    gdf_provincias = load_provincias_boundaries(get_simplification_level(zoom))
+    if gdf_provincias is None:
+        return None
+
+    logger.info("Agregando provincias al mapa...")
+    return add_id_layer(map_obj, gdf_provincias, "Provincias", {
+        "fillColor": "transparent",
+        "color": "black",
+        "weight": 1.5,
+        "fillOpacity": 0,
+    })
+
+@cache.cached("provincias.build_provincias_choropleth", maxsize=8, groups=("cantones",))
+def build_provincias_choropleth(level):
+    """Coropletas de densidad por provincia desde los agregados cacheados (cache por nivel)"""
+    gdf_provincias = load_provincias_boundaries(level)
+    if gdf_provincias is None:
+        return None
+    return build_choropleth(
+        gdf_provincias,
+        data_service.calculate_population_by_provincia(),
+        data_service.load_unit_areas('provincias'),
+        'DPA_DESPRO'
+    )
+
+@provincias_bp.route("/provincias")
+def mapa_provincias():
+    """Mapa de población por provincia"""
+    # Importación diferida: folium (y pandas/branca) solo se cargan al renderizar
+    import folium
+    from utils.hexbin import population_layers
+    logger.info("Generando mapa de provincias...")
+    coropletas = request.args.get('modo') == 'coropletas'
+    capa_tooltips = None
+
+    m = folium.Map(
+        location=[-1.50, -78.50],
+        zoom_start=6,
+        tiles="cartodbpositron",
+        prefer_canvas=True
+    )
+
+    try:
+        if coropletas:
+            # ?modo=coropletas: provincias rellenas por densidad, en una sola capa
+            with span("folium_choropleth"):
+                zoom = current_app.config.get('BOUNDARY_ZOOM', 9)
+                collection = build_provincias_choropleth(get_simplification_level(zoom))
+                if collection is not None:
+                    add_choropleth_layer(m, collection, "Provincia")
+        else:
+            with span("folium_provincias"):
+                capa_tooltips = add_provincias_to_map(m)
+
+        # La población se dibuja en el navegador desde /api/clusters (ver layout.html)
+        logger.info("Mapa de provincias generado exitosamente!")
+
+    except Exception as e:
+        logger.error(f"Error generando mapa de provincias: {e}")
+        import traceback
+        traceback.print_exc()
+
+    with span("folium_render"):
+        mapa_html = m.get_root().render()
+
+    with span("template"):
+        return render_template(
+            "provincias.html",
+            mapa=mapa_html,
+            map_name=m.get_name(),
+            ruta_activa="provincias",
+            **population_layers(request.args.get('hex'), coropletas),
+            capa_tooltips=tooltip_layer(capa_tooltips, 'provincias'),
+            tabla_poblacion={'api': '/api/population-by-provincia', 'unidades': 'provincias'}
+        )
@@ -1,13 +1,22 @@
+import argparse
+import hashlib
 import os
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import logging
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Manifiesto de archivos a descargar: nombre -> {url, sha256, size}
+MANIFEST_PATH = Path(__file__).parent / "data_manifest.json"
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 4
+
 def setup_data_directory():
     """Configura el directorio de datos"""
     # En Railway, usar /app/data
@@ -16,102 +25,166 @@ def setup_data_directory():
     else:
         # En desarrollo local
         data_dir = Path(__file__).parent / "data"
-    
+
     data_dir.mkdir(exist_ok=True)
     logger.info(f"📁 Directorio de datos: {data_dir}")
     return data_dir
 
-def verify_downloaded_file(file_path):
-    """Verifica que el archivo descargado sea válido"""
+def load_manifest(manifest_path=MANIFEST_PATH, base_url=None):
+    """Lee el manifiesto; `base_url` (o DATA_BASE_URL) reemplaza el origen de todas las URLs"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    base_url = base_url or os.environ.get('DATA_BASE_URL')
+    files = manifest['files']
+    if base_url:
+        for filename, entry in files.items():
+            entry['url'] = f"{base_url.rstrip('/')}/{filename}"
+    return files
+
+def create_session(workers=DEFAULT_WORKERS):
+    """Sesión HTTP con pool de conexiones (una por worker) y reintentos con backoff"""
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Railway-App/1.0',
+        'Accept': 'application/octet-stream'
+    })
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def sha256_file(file_path, digest=None):
+    """sha256 de un archivo (o continúa un hash ya iniciado)"""
+    digest = digest or hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+def verify_downloaded_file(file_path, entry, digest=None):
+    """Verifica tamaño y sha256 contra el manifiesto; sin hash, solo una comprobación rápida"""
     try:
         if not file_path.exists():
             return False
-            
+
         file_size = file_path.stat().st_size
         if file_size == 0:
             logger.error(f"❌ Archivo descargado está vacío: {file_path}")
             return False
-            
-        # Verificar que sea JSON válido
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            if not first_line.startswith('{'):
-                logger.error(f"❌ Archivo no comienza con JSON válido: {first_line[:50]}")
-                return False
-                
-        # Intentar cargar como JSON completo
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        if 'type' not in data:
-            logger.error(f"❌ Archivo no tiene campo 'type': {file_path}")
+
+        if entry.get('size') is not None and file_size != entry['size']:
+            logger.error(f"❌ Tamaño incorrecto en {file_path}: {file_size:,} (esperado {entry['size']:,})")
             return False
-            
+
+        if entry.get('sha256'):
+            actual = (digest or sha256_file(file_path)).hexdigest()
+            if actual != entry['sha256']:
+                logger.error(f"❌ sha256 no coincide en {file_path}: {actual}")
+                return False
+        else:
+            # Sin hash en el manifiesto: comprobar solo que parezca JSON
+            with open(file_path, 'rb') as f:
+                if f.read(1) != b'{':
+                    logger.error(f"❌ Archivo no comienza con JSON válido: {file_path}")
+                    return False
+
         logger.info(f"✅ Archivo válido: {file_path} ({file_size:,} bytes)")
         return True
-        
+
     except Exception as e:
         logger.error(f"❌ Error verificando archivo {file_path}: {e}")
         return False
 
-def download_from_github(filename, github_url, data_dir):
-    """Descarga archivos desde GitHub"""
+def download_file(session, filename, entry, data_dir):
+    """Descarga un archivo reanudando el `.tmp` parcial con HTTP Range si existe"""
     file_path = data_dir / filename
-    
+    temp_path = file_path.with_name(file_path.name + '.tmp')
+
     # Verificar si ya existe y es válido
     if file_path.exists():
-        if verify_downloaded_file(file_path):
+        if verify_downloaded_file(file_path, entry):
             logger.info(f"✅ {filename} ya existe y es válido")
             return True
-        else:
-            logger.warning(f"⚠️ {filename} existe pero es inválido, re-descargando...")
-            file_path.unlink()
-    
-    try:
-        logger.info(f"⬇️ Descargando {filename}...")
-        
-        headers = {
-            'User-Agent': 'Railway-App/1.0',
-            'Accept': 'application/octet-stream'
-        }
-        
-        response = requests.get(github_url, headers=headers, timeout=300, stream=True)
-        response.raise_for_status()
-        
-        # Crear archivo temporal primero
-        temp_path = file_path.with_suffix('.tmp')
-        
-        with open(temp_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        # Verificar archivo temporal
-        if verify_downloaded_file(temp_path):
-            # Mover archivo temporal al final
-            temp_path.rename(file_path)
-            file_size = file_path.stat().st_size
-            logger.info(f"✅ {filename} descargado y verificado ({file_size:,} bytes)")
-            return True
-        else:
-            logger.error(f"❌ Archivo descargado es inválido: {filename}")
-            temp_path.unlink()
+        logger.warning(f"⚠️ {filename} existe pero es inválido, re-descargando...")
+
+    for attempt in range(2):
+        offset = temp_path.stat().st_size if temp_path.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        try:
+            with session.get(entry['url'], headers=headers, timeout=(10, 300), stream=True) as response:
+                if response.status_code == 416:
+                    # El parcial ya está completo (o es más largo que el archivo remoto)
+                    logger.info(f"↪️ {filename}: parcial de {offset:,} bytes ya completo")
+                    digest = sha256_file(temp_path)
+                else:
+                    response.raise_for_status()
+                    if offset and response.status_code == 206:
+                        logger.info(f"⏯️ Reanudando {filename} desde {offset:,} bytes")
+                        digest = sha256_file(temp_path)
+                        mode = 'ab'
+                    else:
+                        logger.info(f"⬇️ Descargando {filename}...")
+                        digest = hashlib.sha256()
+                        mode = 'wb'
+
+                    with open(temp_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+                            digest.update(chunk)
+        except Exception as e:
+            # El parcial se conserva para reanudar en la siguiente ejecución
+            logger.error(f"❌ Error descargando {filename}: {e}")
             return False
-        
-    except Exception as e:
-        logger.error(f"❌ Error descargando {filename}: {e}")
-        # Limpiar archivos parciales
+
+        if verify_downloaded_file(temp_path, entry, digest):
+            os.replace(temp_path, file_path)
+            logger.info(f"✅ {filename} descargado y verificado ({file_path.stat().st_size:,} bytes)")
+            return True
+
+        # Parcial corrupto: descartarlo y reintentar una vez desde cero
+        logger.warning(f"⚠️ {filename} descargado es inválido, reintentando desde cero...")
+        temp_path.unlink(missing_ok=True)
+
+    return False
+
+def download_all(files, data_dir, workers=DEFAULT_WORKERS, session=None):
+    """Descarga los archivos del manifiesto en paralelo; devuelve {nombre: éxito}"""
+    session = session or create_session(workers)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+        futures = {
+            executor.submit(download_file, session, filename, entry, data_dir): filename
+            for filename, entry in files.items()
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+def write_manifest(data_dir, manifest_path=MANIFEST_PATH):
+    """Actualiza sha256 y tamaño del manifiesto a partir de los archivos locales"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    for filename, entry in manifest['files'].items():
+        file_path = data_dir / filename
         if file_path.exists():
-            file_path.unlink()
-        temp_path = file_path.with_suffix('.tmp')
-        if temp_path.exists():
-            temp_path.unlink()
-        return False
+            entry['sha256'] = sha256_file(file_path).hexdigest()
+            entry['size'] = file_path.stat().st_size
+            logger.info(f"📝 {filename}: {entry['sha256']}")
+        else:
+            logger.warning(f"⚠️ {filename} no existe localmente; se mantiene su entrada")
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
 
 def create_minimal_fallback_data(data_dir):
     """Crea datos mínimos de fallback"""
     logger.info("🔧 Creando datos de fallback...")
-    
+
     cantones_fallback = {
         "type": "FeatureCollection",
         "features": [
@@ -125,14 +198,14 @@ def create_minimal_fallback_data(data_dir):
                 "geometry": {
                     "type": "Polygon",
                     "coordinates": [[
-                        [-78.6, -0.4], [-78.4, -0.4], 
+                        [-78.6, -0.4], [-78.4, -0.4],
                         [-78.4, -0.1], [-78.6, -0.1], [-78.6, -0.4]
                     ]]
                 }
             }
         ]
     }
-    
+
     poblacion_fallback = {
         "type": "FeatureCollection",
         "features": [
@@ -143,12 +216,12 @@ def create_minimal_fallback_data(data_dir):
             }
         ]
     }
-    
+
     files_to_create = {
         "cantones.geojson": cantones_fallback,
         "poblacion_ecuador_realistic.geojson": poblacion_fallback
     }
-    
+
     for filename, data in files_to_create.items():
         file_path = data_dir / filename
         if not file_path.exists():
@@ -156,75 +229,41 @@ def create_minimal_fallback_data(data_dir):
                 json.dump(data, f)
             logger.info(f"✅ Creado {filename} de fallback")
 
-def main():
+def main(argv=None):
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Descarga y verifica los datasets de la aplicación")
+    parser.add_argument("--data-dir", type=Path, help="Directorio destino (por defecto data/ o /app/data)")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH, help="Manifiesto con URLs y sha256")
+    parser.add_argument("--base-url", help="Origen alternativo para todas las URLs (p. ej. un servidor local)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Descargas simultáneas")
+    parser.add_argument("--write-manifest", action="store_true",
+                        help="Registrar sha256 y tamaño de los archivos locales en el manifiesto")
+    args = parser.parse_args(argv)
+
     logger.info("🚀 Iniciando configuración de datos...")
-    
-    data_dir = setup_data_directory()
-    
-    # REEMPLAZA ESTAS URLs CON LAS DE TU RELEASE
-    files_to_download = {
-        "cantones.geojson": "https://github.com/JairAlexey/MapaPoblacion/releases/download/v1.0/cantones.geojson",
-        "poblacion_ecuador_realistic.geojson": "https://github.com/JairAlexey/MapaPoblacion/releases/download/v1.0/poblacion_ecuador_realistic.geojson",
-        "parroquiasEcuador.geojson": "https://github.com/JairAlexey/MapaPoblacion/releases/download/v1.0/parroquiasEcuador.geojson"
-    }
-    
-    success_count = 0
-    for filename, url in files_to_download.items():
-        if download_from_github(filename, url, data_dir):
-            success_count += 1
-        time.sleep(2)
-    
+
+    data_dir = args.data_dir or setup_data_directory()
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.write_manifest:
+        write_manifest(data_dir, args.manifest)
+        return True
+
+    files = load_manifest(args.manifest, args.base_url)
+    results = download_all(files, data_dir, args.workers)
+    success_count = sum(results.values())
+    logger.info(f"📦 Descargas completas: {success_count}/{len(results)}")
+
     if success_count == 0:
         logger.warning("⚠️ Usando datos de fallback")
         create_minimal_fallback_data(data_dir)
-    
+
     geojson_files = list(data_dir.glob("*.geojson"))
     logger.info(f"📊 Archivos disponibles: {[f.name for f in geojson_files]}")
-    
+
     logger.info("✅ Configuración completada")
     return True
 
 if __name__ == "__main__":
     success = main()
     exit(0 if success else 1)
-def main():
-    """Función principal para configurar datos"""
-    logger.info("🚀 Iniciando configuración de datos...")
-    
-    # Configurar directorio
-    data_dir = setup_data_directory()
-    
-    # URLs de tus archivos (tendrás que reemplazar con tus URLs reales)
-    files_to_download = {
-        "cantones.geojson": "https://raw.githubusercontent.com/TU_USUARIO/TU_REPO/main/data/cantones.geojson",
-        # Para archivos grandes, mejor usar GitHub Releases:
-        # "poblacion_ecuador_realistic.geojson": "https://github.com/TU_USUARIO/TU_REPO/releases/download/v1.0/poblacion_ecuador_realistic.geojson"
-    }
-    
-    # Intentar descargar archivos
-    success_count = 0
-    for filename, url in files_to_download.items():
-        if download_from_github(filename, url, data_dir):
-            success_count += 1
-        time.sleep(1)  # Pausa entre descargas
-    
-    # Si no se pudieron descargar archivos, crear fallbacks
-    if success_count == 0:
-        logger.warning("⚠️ No se pudieron descargar archivos, usando datos de fallback")
-        create_minimal_fallback_data(data_dir)
-    
-    # Verificar archivos finales
-    geojson_files = list(data_dir.glob("*.geojson"))
-    logger.info(f"📊 Archivos disponibles: {[f.name for f in geojson_files]}")
-    
-    if len(geojson_files) > 0:
-        logger.info("✅ Configuración de datos completada exitosamente")
-        return True
-    else:
-        logger.error("❌ No se pudieron configurar los datos")
-        return False
-
-if __name__ == "__main__":
-    success = main()
-    exit(0 if success else 1)
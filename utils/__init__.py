@@ -1,3 +1,11 @@
-from .data_loader import load_geojson_with_fallback, get_data_directory, load_cantones, load_population_data, load_parroquias
+# Reexportaciones diferidas: importar utils.<módulo> no debe cargar geopandas
+_DATA_LOADER_EXPORTS = ('load_geojson_with_fallback', 'get_data_directory', 'load_cantones', 'load_population_data', 'load_parroquias', 'load_boundaries')
 
-__all__ = ['load_geojson_with_fallback', 'get_data_directory', 'load_cantones', 'load_population_data', 'load_parroquias']
+__all__ = list(_DATA_LOADER_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _DATA_LOADER_EXPORTS:
+        from . import data_loader
+        return getattr(data_loader, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,113 @@
+import logging
+import numpy as np
+import pandas as pd
+from shapely.strtree import STRtree
+
+logger = logging.getLogger(__name__)
+
+# Columna con el código entero de cada unidad, asignado una vez al cargarla
+CODE_FIELD = 'codigo'
+
+# Niveles administrativos agregados: campos del código DPA y del nombre y campos extra de cada entrada
+AGGREGATION_LEVELS = {
+    'cantones': {
+        'label': 'Cantón',
+        'code_field': 'DPA_CANTON',
+        'name_field': 'DPA_DESCAN',
+        'fallback_name': 'Canton_{}',
+        'extra_fields': {},
+        'log_threshold': 50000,
+    },
+    'parroquias': {
+        'label': 'Parroquia',
+        'code_field': 'DPA_PARROQ',
+        'name_field': 'PARROQUIA',
+        'fallback_name': 'Parroquia_{}',
+        'extra_fields': {'provincia': 'PROVINCIA', 'canton': 'CANTON'},
+        'log_threshold': 10000,
+    },
+    # Provincias: unión de cantones (utils/provincias.py), sin agregación espacial propia
+    'provincias': {
+        'label': 'Provincia',
+        'code_field': 'DPA_PROVIN',
+        'name_field': 'DPA_DESPRO',
+        'fallback_name': 'Provincia_{}',
+        'extra_fields': {},
+        'log_threshold': 500000,
+    },
+}
+
+
+def unit_codes(gdf_units, level):
+    """Códigos enteros estables de las unidades: el código DPA si es numérico y único,
+    si no una numeración secuencial (1..n) en el orden del archivo"""
+    field = AGGREGATION_LEVELS[level]['code_field']
+    if field in gdf_units.columns:
+        codes = pd.to_numeric(gdf_units[field], errors='coerce')
+        if codes.notna().all() and codes.is_unique:
+            return codes.to_numpy(dtype=np.int64)
+        logger.warning(f"⚠️ {field} no es numérico y único en {level}; se usan códigos secuenciales")
+    return np.arange(1, len(gdf_units) + 1, dtype=np.int64)
+
+
+def with_unit_codes(gdf_units, level):
+    """Agrega la columna CODE_FIELD a las unidades de un nivel (sin copiar el GeoDataFrame)"""
+    if gdf_units is not None:
+        gdf_units[CODE_FIELD] = unit_codes(gdf_units, level)
+    return gdf_units
+
+
+def unit_membership(unit_geoms, point_tree):
+    """Pares (punto, unidad) de puntos que intersectan cada unidad y candidatos por bbox.
+
+    Devuelve (pair_points, pair_units, candidates): índices de los pares y, por unidad,
+    el número de puntos cuyo bbox la intersecta (el antiguo `points_count`).
+    """
+    unit_geoms = np.asarray(unit_geoms, dtype=object)
+    bbox_units, _ = point_tree.query(unit_geoms)
+    candidates = np.bincount(bbox_units, minlength=len(unit_geoms))
+    pair_units, pair_points = point_tree.query(unit_geoms, predicate='intersects')
+    return pair_points, pair_units, candidates
+
+
+def aggregate_points(gdf_units, gdf_points):
+    """Población total y candidatos por unidad usando un STRtree sobre los puntos"""
+    point_tree = STRtree(np.asarray(gdf_points.geometry.values))
+    pair_points, pair_units, candidates = unit_membership(gdf_units.geometry.values, point_tree)
+    totals = totals_from_pairs(pair_points, pair_units, gdf_points['population'].to_numpy(), len(gdf_units))
+    return totals, candidates, (pair_points, pair_units)
+
+
+def totals_from_pairs(pair_points, pair_units, population, n_units):
+    return np.bincount(pair_units, weights=np.asarray(population, dtype=np.float64)[pair_points], minlength=n_units)
+
+
+def population_list(gdf_units, totals, candidates, level):
+    """Lista de población por unidad, ordenada de mayor a menor (formato de las APIs)"""
+    spec = AGGREGATION_LEVELS[level]
+    codes = gdf_units[CODE_FIELD].to_numpy() if CODE_FIELD in gdf_units.columns else unit_codes(gdf_units, level)
+    population_list = []
+    for idx, unit in enumerate(gdf_units.drop(columns='geometry').to_dict('records')):
+        name = unit.get(spec['name_field'], spec['fallback_name'].format(gdf_units.index[idx]))
+        # Redondear antes de truncar: el orden de la suma no debe cambiar el entero (376.9999999 -> 377)
+        population = int(round(float(totals[idx]), 6))
+        # Una entrada por unidad: los nombres se repiten entre cantones, el código no
+        entry = {'code': int(codes[idx]), 'name': name}
+        for key, field in spec['extra_fields'].items():
+            entry[key] = unit.get(field, 'N/A')
+        entry.update({
+            'population': population,
+            'formatted_population': f"{population:,}".replace(',', '.'),
+            'points_count': int(candidates[idx]),  # Para debugging
+        })
+        population_list.append(entry)
+
+        if population > spec['log_threshold']:
+            logger.info(f"{spec['label']} {name}: {population:,} habitantes ({int(candidates[idx])} puntos)")
+
+    population_list.sort(key=lambda x: x['population'], reverse=True)
+
+    total_calculated = sum(item['population'] for item in population_list)
+    logger.info(f"Población calculada para {len(population_list)} {level}")
+    logger.info(f"Población total calculada: {total_calculated:,} habitantes")
+    return population_list
@@ -0,0 +1,232 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify
+from utils.singleflight import SingleFlightCache
+
+logger = logging.getLogger(__name__)
+
+# Valor por defecto del parámetro `ttl`: usar CACHE_DEFAULT_TIMEOUT de la configuración
+DEFAULT_TTL = object()
+
+
+def estimate_size(value, _seen=None):
+    """Estimación aproximada (bytes) de la memoria ocupada por un valor cacheado"""
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if value is None:
+        return 0
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):  # DataFrame / GeoDataFrame
+        size = int(value.memory_usage(index=True, deep=True).sum())
+        if hasattr(value, 'geometry'):
+            # sys.getsizeof no ve las coordenadas GEOS: ~16 bytes por coordenada
+            import shapely
+            size += int(shapely.get_num_coordinates(value.geometry.values).sum()) * 16
+        return size
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if hasattr(value, 'nbytes'):  # numpy y objetos con tamaño propio (PopulationGrid)
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _seen) for v in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_size(vars(value), _seen)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'created', 'expires')
+
+    def __init__(self, value, size, ttl):
+        self.value = value
+        self.size = size
+        self.created = time.time()
+        self.expires = self.created + ttl if ttl else None
+
+
+class ManagedFunction(SingleFlightCache):
+    """Función cacheada cuyos resultados viven en el CacheManager (TTL, LRU y presupuesto global)"""
+
+    def __init__(self, manager, name, func, ttl, maxsize, groups):
+        super().__init__(func, maxsize)
+        self.manager = manager
+        self.name = name
+        self.ttl = ttl
+        self.groups = groups
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def effective_ttl(self):
+        return self.manager.default_ttl if self.ttl is DEFAULT_TTL else self.ttl
+
+    def _lookup(self, key):
+        return self.manager._get(self, key)
+
+    def _prepare(self, value):
+        # estimate_size puede recorrer GeoDataFrames enteros: se mide sin tomar ningún lock
+        return value, estimate_size(value)
+
+    def _store(self, key, prepared):
+        self.manager._put(self, key, *prepared)
+
+    def _clear_results(self):
+        self.manager._drop(self)
+
+    def _size(self):
+        with self.manager._lock:
+            return len(self.manager._keys_of(self))
+
+
+class CacheManager:
+    """Registro central de cachés con nombre: TTL, expulsión LRU y presupuesto global en bytes"""
+
+    def __init__(self, max_bytes=None, default_ttl=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # (nombre, clave) -> _Entry, en orden LRU
+        self._functions = {}
+        self._total_bytes = 0
+
+    def configure(self, max_bytes=None, default_ttl=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+    def cached(self, name, ttl=DEFAULT_TTL, maxsize=1, groups=()):
+        """Decorador que registra una función cacheada con nombre, TTL y grupos de invalidación"""
+        def decorator(func):
+            if name in self._functions:
+                raise ValueError(f"Cache duplicada: {name}")
+            managed = ManagedFunction(self, name, func, ttl, maxsize, tuple(groups))
+            self._functions[name] = managed
+            return managed
+        return decorator
+
+    # --- Acceso a entradas (llamado desde ManagedFunction) ---
+
+    def _get(self, func, key):
+        with self._lock:
+            entry = self._entries.get((func.name, key))
+            if entry is None:
+                return False, None
+            if entry.expires is not None and entry.expires < time.time():
+                self._remove((func.name, key))
+                func.expirations += 1
+                return False, None
+            self._entries.move_to_end((func.name, key))
+            return True, entry.value
+
+    def _put(self, func, key, value, size):
+        with self._lock:
+            self._remove((func.name, key))
+            self._entries[(func.name, key)] = _Entry(value, size, func.effective_ttl)
+            self._total_bytes += size
+
+            # Respetar maxsize por función
+            keys = self._keys_of(func)
+            while func.maxsize is not None and len(keys) > func.maxsize:
+                self._remove(keys.pop(0))
+                func.evictions += 1
+
+            # Presupuesto global: expulsar las entradas menos usadas recientemente
+            if self.max_bytes:
+                for entry_key in list(self._entries):
+                    if self._total_bytes <= self.max_bytes:
+                        break
+                    if entry_key == (func.name, key):
+                        continue
+                    self._remove(entry_key)
+                    self._functions[entry_key[0]].evictions += 1
+                    logger.info(f"♻️ Cache expulsada por presupuesto: {entry_key[0]}")
+                if self._total_bytes > self.max_bytes:
+                    logger.warning(f"⚠️ {func.name} ({size / 1e6:.1f} MB) supera el presupuesto de cache")
+
+    def _remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _keys_of(self, func):
+        return [k for k in self._entries if k[0] == func.name]
+
+    def _drop(self, func):
+        with self._lock:
+            for entry_key in self._keys_of(func):
+                self._remove(entry_key)
+
+    # --- API pública ---
+
+    def clear(self, group=None):
+        """Limpia todas las cachés, o solo las de un grupo; devuelve los nombres limpiados"""
+        cleared = []
+        for name, func in self._functions.items():
+            if group is None or group in func.groups:
+                func.cache_clear()
+                cleared.append(name)
+        return cleared
+
+    def stats(self):
+        """Estadísticas por entrada registrada"""
+        now = time.time()
+        # cache_info() toma el lock de cada función: leerlo antes de tomar el del manager
+        infos = {name: func.cache_info() for name, func in self._functions.items()}
+        with self._lock:
+            entries = {}
+            for name, func in self._functions.items():
+                info = infos[name]
+                stored = [self._entries[k] for k in self._keys_of(func)]
+                entries[name] = {
+                    'hits': info.hits,
+                    'misses': info.misses,
+                    'coalesced': info.coalesced,
+                    'clears': func.clears,
+                    'evictions': func.evictions,
+                    'expirations': func.expirations,
+                    'entries': len(stored),
+                    'maxsize': func.maxsize,
+                    'bytes': sum(e.size for e in stored),
+                    'age_seconds': round(now - min(e.created for e in stored), 1) if stored else None,
+                    'ttl_seconds': func.effective_ttl,
+                    'groups': list(func.groups),
+                }
+            return {
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'default_ttl_seconds': self.default_ttl,
+                'entries': entries,
+            }
+
+    def collect_metrics(self, registry):
+        """Colector para /metrics: aciertos, fallos, esperas agrupadas y bytes por caché"""
+        for name, entry in self.stats()['entries'].items():
+            registry.set_counter("mapa_cache_hits_total", entry['hits'], cache=name)
+            registry.set_counter("mapa_cache_misses_total", entry['misses'], cache=name)
+            registry.set_counter("mapa_cache_coalesced_total", entry['coalesced'], cache=name)
+            registry.set_counter("mapa_cache_evictions_total", entry['evictions'], cache=name)
+            registry.set_gauge("mapa_cache_entries", entry['entries'], cache=name)
+            registry.set_gauge("mapa_cache_bytes", entry['bytes'], cache=name)
+
+    def init_app(self, app):
+        """Aplica CACHE_MAX_BYTES / CACHE_DEFAULT_TIMEOUT y registra /api/cache-stats"""
+        self.configure(app.config.get('CACHE_MAX_BYTES'), app.config.get('CACHE_DEFAULT_TIMEOUT'))
+
+        from utils.metrics import registry
+        registry.add_collector(self.collect_metrics)
+
+        @app.route('/api/cache-stats')
+        def cache_stats():
+            """Estadísticas de las cachés registradas"""
+            return jsonify({'success': True, 'data': self.stats()})
+
+
+cache = CacheManager()
@@ -0,0 +1,65 @@
+"""Población dentro de un radio de muchos establecimientos (áreas de cobertura).
+
+Usa el árbol KD de los puntos originales del índice de clusters: para cada
+establecimiento se consulta el rectángulo que contiene su círculo (ensanchado en
+longitud según la latitud) y los candidatos se filtran por distancia haversine. Un
+array booleano de puntos cubiertos cuenta una sola vez la población de las zonas
+donde se superponen varios establecimientos.
+"""
+import math
+import numpy as np
+from utils.clustering import lon_to_x, lat_to_y, x_to_lon, y_to_lat
+from utils.hexbin import KM_PER_DEGREE_LAT
+
+# Radio medio de la Tierra (km)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lon, lat, lons, lats):
+    """Distancia en km de (lon, lat) a cada punto de los arrays lons, lats"""
+    lon, lat = math.radians(lon), math.radians(lat)
+    lons, lats = np.radians(lons), np.radians(lats)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def circle_bbox(lon, lat, radius_km):
+    """Rectángulo (min_lon, min_lat, max_lon, max_lat) que contiene el círculo geodésico.
+
+    KM_PER_DEGREE_LAT (110.574) es menor que el grado de la esfera de EARTH_RADIUS_KM
+    (111.195), así que el rectángulo queda algo holgado y nunca recorta el círculo.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    # La longitud se ensancha con la latitud más alejada del ecuador que toca el círculo
+    max_abs_lat = min(abs(lat) + dlat, 89.9)
+    dlon = min(radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat))), 180.0)
+    return lon - dlon, max(lat - dlat, -90.0), lon + dlon, min(lat + dlat, 90.0)
+
+
+def catchment(points, lons, lats, radii_km):
+    """Población cubierta por cada establecimiento y por todos juntos.
+
+    `points` es el nivel de puntos originales de un ClusterIndex (árbol KD y población
+    en el mismo orden). Devuelve (población por establecimiento, puntos por
+    establecimiento, población cubierta total, puntos cubiertos totales).
+    """
+    n = len(lons)
+    population = np.zeros(n, dtype=np.float64)
+    counts = np.zeros(n, dtype=np.int64)
+    covered = np.zeros(len(points), dtype=bool)
+
+    for i, (lon, lat, radius) in enumerate(zip(lons, lats, radii_km)):
+        min_lon, min_lat, max_lon, max_lat = circle_bbox(lon, lat, radius)
+        # En Web Mercator la y crece hacia el sur: max_lat da la y mínima
+        ids = points.index.range(
+            float(lon_to_x(min_lon)), float(lat_to_y(max_lat)),
+            float(lon_to_x(max_lon)), float(lat_to_y(min_lat))
+        )
+        if len(ids) == 0:
+            continue
+        inside = ids[haversine_km(lon, lat, x_to_lon(points.xs[ids]), y_to_lat(points.ys[ids])) <= radius]
+        population[i] = points.population[inside].sum()
+        counts[i] = len(inside)
+        covered[inside] = True
+
+    return population, counts, float(points.population[covered].sum()), int(covered.sum())
@@ -0,0 +1,93 @@
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# CRS de áreas iguales (WGS 84 / NSIDC EASE-Grid 2.0 Global) para calcular km² una sola vez
+EQUAL_AREA_CRS = "EPSG:6933"
+
+# Clases de densidad (hab/km²): límite superior, color y opacidad; la misma escala de la leyenda
+DENSITY_CLASSES = (
+    (5, "#0066cc", 0.3),      # Azul claro - muy baja densidad
+    (25, "#00aa44", 0.4),     # Verde - baja densidad
+    (100, "#88dd00", 0.5),    # Verde claro - densidad moderada baja
+    (500, "#ffff00", 0.6),    # Amarillo - densidad moderada
+    (1500, "#ffaa00", 0.7),   # Naranja - densidad alta
+    (5000, "#ff5500", 0.8),   # Rojo-naranja - densidad muy alta
+    (float('inf'), "#cc0000", 0.9),  # Rojo intenso - densidad extrema
+)
+
+# 1,234.5 -> 1.234,5
+DECIMAL_SEPARATORS = str.maketrans(',.', '.,')
+
+
+@lru_cache(maxsize=128)
+def get_population_color(pop_value, region="continental"):
+    """Retorna color basado en la densidad de población, escala unificada para todo Ecuador"""
+    # Paleta tipo LandScan unificada para todo el territorio ecuatoriano
+    for upper, color, opacity in DENSITY_CLASSES:
+        if pop_value < upper:
+            return color, opacity
+
+
+def unit_areas_km2(gdf_units):
+    """Área (km²) de cada unidad por código, calculada en un CRS de áreas iguales"""
+    from utils.aggregation import CODE_FIELD
+    areas = gdf_units.to_crs(EQUAL_AREA_CRS).geometry.area / 1e6
+    return dict(zip(gdf_units[CODE_FIELD].tolist(), areas.tolist()))
+
+
+def build_choropleth(gdf_units, population_data, areas, name_field):
+    """FeatureCollection con una unidad por feature y su clase de densidad ya resuelta.
+
+    Se dibuja como una sola capa GeoJSON estilizada por propiedades, en lugar de un
+    `folium.GeoJson` por unidad.
+    """
+    from utils.aggregation import CODE_FIELD
+    population_dict = {item['code']: item for item in population_data}
+    features = []
+    for code, name, geometry in zip(gdf_units[CODE_FIELD].tolist(), gdf_units[name_field], gdf_units.geometry):
+        if geometry is None:
+            continue
+        info = population_dict.get(code)
+        area = areas.get(code)
+        if info is None or not area:
+            density = None
+            color, opacity = "#999999", 0.1
+        else:
+            density = info['population'] / area
+            color, opacity = get_population_color(density)
+
+        features.append({
+            'type': 'Feature',
+            'geometry': geometry.__geo_interface__,
+            'properties': {
+                'name': name,
+                'formatted_population': info['formatted_population'] if info else 'No disponible',
+                'density': f"{density:,.1f} hab/km²".translate(DECIMAL_SEPARATORS) if density is not None else 'No disponible',
+                'color': color,
+                'opacity': opacity,
+            },
+        })
+
+    logger.info(f"🎨 Coropletas: {len(features)} unidades")
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def add_choropleth_layer(map_obj, collection, label):
+    """Agrega la FeatureCollection de coropletas al mapa como una sola capa estilizada"""
+    import folium
+    folium.GeoJson(
+        collection,
+        name=f"Densidad por {label}",
+        style_function=lambda feature: {
+            "fillColor": feature['properties']['color'],
+            "fillOpacity": feature['properties']['opacity'],
+            "color": "black",
+            "weight": 0.5,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['name', 'formatted_population', 'density'],
+            aliases=[f"{label}:", "Habitantes:", "Densidad:"],
+        ),
+    ).add_to(map_obj)
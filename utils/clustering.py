@@ -0,0 +1,229 @@
+import math
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Parámetros del agrupamiento (mismos valores por defecto que supercluster)
+CLUSTER_RADIUS = 40  # radio de agrupamiento en píxeles
+CLUSTER_EXTENT = 512  # tamaño de tesela en píxeles
+CLUSTER_MIN_ZOOM = 0
+CLUSTER_MAX_ZOOM = 16  # por encima se devuelven los puntos originales
+KD_NODE_SIZE = 64
+
+
+def lon_to_x(lon):
+    """Longitud -> coordenada Web Mercator normalizada a [0, 1]"""
+    return np.asarray(lon, dtype=np.float64) / 360.0 + 0.5
+
+
+def lat_to_y(lat):
+    """Latitud -> coordenada Web Mercator normalizada a [0, 1] (crece hacia el sur)"""
+    sin = np.sin(np.radians(np.asarray(lat, dtype=np.float64)))
+    y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / math.pi
+    return np.clip(y, 0.0, 1.0)
+
+
+def x_to_lon(x):
+    return (np.asarray(x, dtype=np.float64) - 0.5) * 360.0
+
+
+def y_to_lat(y):
+    y2 = (180.0 - np.asarray(y, dtype=np.float64) * 360.0) * math.pi / 180.0
+    return 360.0 * np.arctan(np.exp(y2)) / math.pi - 90.0
+
+
+class KDIndex:
+    """Árbol KD estático sobre arrays (estilo kdbush) para consultas por rectángulo.
+
+    Los puntos se reordenan de modo que cada nodo ocupa un rango contiguo; `order` es
+    la permutación aplicada y las hojas de hasta `node_size` puntos se filtran de
+    forma vectorizada. Las consultas devuelven posiciones en el orden del árbol.
+    """
+
+    def __init__(self, xs, ys, node_size=KD_NODE_SIZE):
+        self.node_size = node_size
+        self.order = np.arange(len(xs), dtype=np.int64)
+        self.xs = np.asarray(xs, dtype=np.float64).copy()
+        self.ys = np.asarray(ys, dtype=np.float64).copy()
+
+        stack = [(0, len(self.order) - 1, 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo <= node_size:
+                continue
+            m = (lo + hi) >> 1
+            coords = self.xs if axis == 0 else self.ys
+            local = np.argpartition(coords[lo:hi + 1], m - lo)
+            for array in (self.order, self.xs, self.ys):
+                array[lo:hi + 1] = array[lo:hi + 1][local]
+            stack.append((lo, m - 1, 1 - axis))
+            stack.append((m + 1, hi, 1 - axis))
+
+    def range(self, min_x, min_y, max_x, max_y):
+        """Posiciones (en el orden del árbol) de los puntos dentro del rectángulo"""
+        found = []
+        stack = [(0, len(self.xs) - 1, 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi < lo:
+                continue
+            if hi - lo <= self.node_size:
+                xs, ys = self.xs[lo:hi + 1], self.ys[lo:hi + 1]
+                inside = (xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y)
+                found.append(lo + np.flatnonzero(inside))
+                continue
+
+            m = (lo + hi) >> 1
+            x, y = self.xs[m], self.ys[m]
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                found.append(np.array([m], dtype=np.int64))
+
+            value, low, high = (x, min_x, max_x) if axis == 0 else (y, min_y, max_y)
+            if low <= value:
+                stack.append((lo, m - 1, 1 - axis))
+            if high >= value:
+                stack.append((m + 1, hi, 1 - axis))
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.xs.nbytes + self.ys.nbytes
+
+
+class ClusterLevel:
+    """Clusters de un nivel de zoom: centroide ponderado por población, conteo y población total.
+
+    Todos los arrays se guardan en el orden del árbol KD del nivel.
+    """
+
+    def __init__(self, xs, ys, population, counts):
+        self.index = KDIndex(xs, ys)
+        order = self.index.order
+        self.population = np.asarray(population, dtype=np.float64)[order]
+        self.counts = np.asarray(counts, dtype=np.int32)[order]
+        self.index.order = None  # solo hacía falta para reordenar los atributos
+
+    @property
+    def xs(self):
+        return self.index.xs
+
+    @property
+    def ys(self):
+        return self.index.ys
+
+    def __len__(self):
+        return len(self.population)
+
+    @property
+    def nbytes(self):
+        return self.population.nbytes + self.counts.nbytes + self.index.nbytes
+
+
+class ClusterIndex:
+    """Índice jerárquico de clusters de población por nivel de zoom (estilo supercluster).
+
+    Cada nivel agrupa los clusters del nivel siguiente (más fino) en celdas de
+    `radius` píxeles en Web Mercator, de forma vectorizada, sumando población y
+    número de puntos; el centroide se pondera por población. Cada nivel tiene su
+    propio árbol KD para responder consultas por rectángulo en milisegundos.
+    """
+
+    def __init__(self, levels, min_zoom=CLUSTER_MIN_ZOOM, max_zoom=CLUSTER_MAX_ZOOM):
+        self.levels = levels
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+
+    @classmethod
+    def from_points(cls, lons, lats, values, radius=CLUSTER_RADIUS, extent=CLUSTER_EXTENT,
+                    min_zoom=CLUSTER_MIN_ZOOM, max_zoom=CLUSTER_MAX_ZOOM):
+        xs = lon_to_x(lons)
+        ys = lat_to_y(lats)
+        population = np.asarray(values, dtype=np.float64)
+        counts = np.ones(len(xs), dtype=np.int64)
+
+        # Nivel max_zoom + 1: los puntos originales
+        levels = {max_zoom + 1: ClusterLevel(xs, ys, population, counts)}
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            xs, ys, population, counts = cls._cluster_level(
+                xs, ys, population, counts, radius / (extent * 2 ** zoom)
+            )
+            levels[zoom] = ClusterLevel(xs, ys, population, counts)
+
+        logger.info(
+            f"🫧 Índice de clusters: {len(levels[max_zoom + 1]):,} puntos, "
+            f"{len(levels[min_zoom]):,} clusters en zoom {min_zoom}"
+        )
+        return cls(levels, min_zoom, max_zoom)
+
+    @staticmethod
+    def _cluster_level(xs, ys, population, counts, cell):
+        """Agrupa los clusters de un nivel en celdas de tamaño `cell` (coordenadas Mercator)"""
+        cols = np.floor(xs / cell).astype(np.int64)
+        rows = np.floor(ys / cell).astype(np.int64)
+        keys = rows * (int(np.ceil(1.0 / cell)) + 1) + cols
+        unique, parents = np.unique(keys, return_inverse=True)
+        n = len(unique)
+
+        total = np.bincount(parents, weights=population, minlength=n)
+        n_points = np.bincount(parents, weights=counts, minlength=n).astype(np.int64)
+        # Centroide ponderado por población; sin población, por número de puntos
+        weights = np.where(total[parents] > 0, population, counts).astype(np.float64)
+        weight_sum = np.bincount(parents, weights=weights, minlength=n)
+        cx = np.bincount(parents, weights=weights * xs, minlength=n) / weight_sum
+        cy = np.bincount(parents, weights=weights * ys, minlength=n) / weight_sum
+        return cx, cy, total, n_points
+
+    @property
+    def points(self):
+        """Nivel de los puntos originales (max_zoom + 1)"""
+        return self.levels[self.max_zoom + 1]
+
+    def get_clusters(self, bbox, zoom):
+        """Clusters dentro de (min_lon, min_lat, max_lon, max_lat) para un zoom.
+
+        Devuelve (zoom efectivo, posiciones, nivel); las posiciones se refieren al nivel.
+        """
+        zoom = int(max(self.min_zoom, min(int(zoom), self.max_zoom + 1)))
+        level = self.levels[zoom]
+        min_lon, min_lat, max_lon, max_lat = bbox
+        min_lon = max(-180.0, min(180.0, min_lon))
+        max_lon = max(-180.0, min(180.0, max_lon))
+        # En Web Mercator la y crece hacia el sur: max_lat da la y mínima
+        ids = level.index.range(
+            float(lon_to_x(min_lon)), float(lat_to_y(max_lat)),
+            float(lon_to_x(max_lon)), float(lat_to_y(min_lat))
+        )
+        return zoom, ids, level
+
+    def cluster_features(self, bbox, zoom, max_features=None):
+        """Features GeoJSON de los clusters de la vista; si exceden `max_features` se
+        conservan los de mayor población. Devuelve (features, truncado)."""
+        zoom, ids, level = self.get_clusters(bbox, zoom)
+        truncated = max_features is not None and len(ids) > max_features
+        if truncated:
+            ids = ids[np.argpartition(-level.population[ids], max_features)[:max_features]]
+
+        lons = x_to_lon(level.xs[ids])
+        lats = y_to_lat(level.ys[ids])
+        features = [
+            {
+                'type': 'Feature',
+                'id': (int(i) << 5) + zoom,
+                'geometry': {'type': 'Point', 'coordinates': [round(float(lon), 6), round(float(lat), 6)]},
+                'properties': {
+                    'cluster': bool(count > 1),
+                    'point_count': int(count),
+                    'population': int(round(float(pop))),
+                },
+            }
+            for i, lon, lat, count, pop in zip(
+                ids.tolist(), lons.tolist(), lats.tolist(),
+                level.counts[ids].tolist(), level.population[ids].tolist()
+            )
+        ]
+        return features, truncated
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels.values())
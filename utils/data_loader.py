@@ -1,15 +1,30 @@
-import geopandas as gpd
-import pandas as pd
+import gzip
+import hashlib
 import json
 import os
 from pathlib import Path
 import logging
 
+try:
+    import zstandard
+except ImportError:  # Solo necesario para los artefactos .zst de compress_data.py
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+# Niveles de simplificación precalculados por build_boundaries.py: zoom mínimo -> tolerancia (grados)
+SIMPLIFICATION_LEVELS = {5: 0.02, 7: 0.005, 9: 0.001, 11: 0.0002}
+SIMPLIFIED_DIR = "simplified"
+
+# Artefactos comprimidos generados por compress_data.py
+COMPRESSED_MANIFEST = "compressed_manifest.json"
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+ZSTD_DICTIONARY = "geojson.zdict"
+
 def get_data_directory():
     """Obtiene el directorio de datos correcto para el entorno"""
     possible_dirs = [
+        Path(os.environ["MAPA_DATA_DIR"]) if os.environ.get("MAPA_DATA_DIR") else None,  # Override explícito (benchmarks)
         Path("/app/data"),  # Railway - donde setup_data.py guarda los archivos
         Path(__file__).parent.parent / "data",  # Desarrollo local
         Path("./data"),  # Relativo
@@ -17,7 +32,7 @@ def get_data_directory():
     ]
     
     for data_dir in possible_dirs:
-        if data_dir.exists():
+        if data_dir is not None and data_dir.exists():
             logger.info(f"📁 Directorio de datos: {data_dir}")
             
             # Listar archivos disponibles
@@ -67,6 +82,7 @@ def validate_geojson_file(file_path):
 
 def load_geojson_with_fallback(base_filename, description="archivo"):
     """Carga archivos GeoJSON con múltiples fallbacks para diferentes entornos"""
+    import geopandas as gpd  # importación diferida: arranque rápido de la aplicación
     
     data_dir = get_data_directory()
     if not data_dir:
@@ -84,6 +100,9 @@ def load_geojson_with_fallback(base_filename, description="archivo"):
         file_path = data_dir / candidate
         
         if not file_path.exists():
+            gdf = load_compressed_geojson(data_dir, candidate, description)
+            if gdf is not None:
+                return gdf
             logger.warning(f"⚠️ Archivo no encontrado: {candidate}")
             continue
             
@@ -140,6 +159,95 @@ def load_geojson_with_fallback(base_filename, description="archivo"):
     logger.error(f"❌ No se pudo cargar {description} desde ningún archivo")
     return None
 
+def load_compressed_manifest(data_dir):
+    """Manifiesto de compress_data.py ({} si no existe o es inválido)"""
+    try:
+        with open(data_dir / COMPRESSED_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_compressed_entry(data_dir, filename):
+    """Entrada del manifiesto comprimido para un archivo original, o None"""
+    return load_compressed_manifest(data_dir).get('files', {}).get(filename)
+
+def read_compressed_file(data_dir, entry):
+    """Descomprime un artefacto en streaming y verifica el sha256 del contenido minificado"""
+    codec = entry['codec']
+    digest = hashlib.sha256()
+    content = bytearray()
+
+    with open(data_dir / entry['file'], 'rb') as f:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Paquete zstandard no instalado")
+            dict_data = None
+            if entry.get('dictionary'):
+                dict_data = zstandard.ZstdCompressionDict((data_dir / entry['dictionary']).read_bytes())
+            reader = zstandard.ZstdDecompressor(dict_data=dict_data).stream_reader(f)
+        else:
+            reader = gzip.GzipFile(fileobj=f, mode='rb')
+
+        with reader:
+            for chunk in iter(lambda: reader.read(1024 * 1024), b""):
+                digest.update(chunk)
+                content += chunk
+
+    if digest.hexdigest() != entry['minified_sha256']:
+        raise ValueError(f"sha256 no coincide en {entry['file']}")
+    return bytes(content)
+
+def load_compressed_geojson(data_dir, filename, description="archivo"):
+    """Carga la versión comprimida de un GeoJSON listada en el manifiesto, si existe"""
+    import geopandas as gpd  # importación diferida: arranque rápido de la aplicación
+    entry = get_compressed_entry(data_dir, filename)
+    if entry is None or not (data_dir / entry['file']).exists():
+        return None
+
+    try:
+        logger.info(f"📦 Cargando {description} comprimido: {entry['file']} ({entry['size']:,} bytes)")
+        data = json.loads(read_compressed_file(data_dir, entry))
+        gdf = gpd.GeoDataFrame.from_features(data['features'])
+        if gdf.crs is None:
+            gdf.set_crs(epsg=4326, inplace=True)
+        logger.info(f"✅ {description} cargado exitosamente desde {entry['file']}: {len(gdf)} features")
+        return gdf
+    except Exception as e:
+        logger.warning(f"⚠️ Error cargando {entry['file']}: {e}")
+        return None
+
+def get_simplification_level(zoom):
+    """Devuelve el nivel de simplificación más detallado adecuado para un zoom de Leaflet"""
+    levels = sorted(SIMPLIFICATION_LEVELS)
+    suitable = [level for level in levels if level <= zoom]
+    return suitable[-1] if suitable else levels[0]
+
+def get_simplified_filename(base_filename, level):
+    """Nombre relativo al directorio de datos del artefacto simplificado para un nivel"""
+    stem = Path(base_filename).stem
+    return f"{SIMPLIFIED_DIR}/{stem}_z{level}.geojson"
+
+def load_boundaries(base_filename, zoom, description="límites"):
+    """Carga límites administrativos simplificados para un zoom desde los artefactos precalculados.
+
+    Si los artefactos no existen (no se ejecutó build_boundaries.py) se carga el archivo
+    original y se simplifica en tiempo de ejecución como último recurso.
+    """
+    level = get_simplification_level(zoom)
+    data_dir = get_data_directory()
+    if data_dir:
+        simplified = get_simplified_filename(base_filename, level)
+        if (data_dir / simplified).exists():
+            gdf = load_geojson_with_fallback(simplified, f"{description} (nivel z{level})")
+            if gdf is not None:
+                return gdf
+
+    logger.warning(f"⚠️ Sin artefacto simplificado z{level} para {base_filename}; ejecute build_boundaries.py")
+    gdf = load_geojson_with_fallback(base_filename, description)
+    if gdf is not None:
+        gdf['geometry'] = gdf.geometry.simplify(tolerance=SIMPLIFICATION_LEVELS[level], preserve_topology=True)
+    return gdf
+
 # Funciones específicas para cada tipo de datos
 def load_cantones():
     """Carga datos de cantones"""
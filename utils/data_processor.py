@@ -26,18 +26,9 @@ class GeoDataProcessor:
             raise Exception(f"Error procesando datos geográficos: {str(e)}")
     
     def get_provincia_names(self):
-        """Obtiene lista única de nombres de provincias"""
+        """Obtiene lista única de nombres de provincias (desde los cantones en cache, sin releer el archivo)"""
         try:
-            cantones_path = os.path.join(self.data_path, 'cantones.geojson')
-            with open(cantones_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            provincias = {}
-            for feature in data['features']:
-                codigo = feature['properties']['DPA_PROVIN']
-                nombre = feature['properties']['DPA_DESPRO']
-                provincias[codigo] = nombre
-            
-            return dict(sorted(provincias.items()))
+            from utils.data_service import data_service
+            return data_service.load_provincia_names()
         except Exception as e:
             raise Exception(f"Error obteniendo provincias: {str(e)}")
@@ -0,0 +1,451 @@
+import importlib
+import logging
+from utils.cache_manager import cache, DEFAULT_TTL
+from utils.data_loader import get_data_directory, load_geojson_with_fallback, load_boundaries
+from utils.metrics import timed, set_dataset_size
+from utils.result_store import results
+
+logger = logging.getLogger(__name__)
+
+# Los puntos de población se recortan a la frontera: todo lo derivado depende de ambos archivos
+POPULATION_INPUTS = ("poblacion_ecuador_realistic.geojson", "ec.json")
+
+# Grupos de invalidación: los datos compartidos pertenecen a ambos mapas
+CANTONES = ("cantones",)
+PARROQUIAS = ("parroquias",)
+SHARED = ("cantones", "parroquias")
+
+
+def dataset(span=None, ttl=None, maxsize=1, groups=SHARED, persist=None):
+    """Marca un método de DataService como dataset cacheado.
+
+    DataService registra cada método marcado en el CacheManager al instanciarse;
+    `persist` son los argumentos de `results.persistent` si el resultado se guarda en disco.
+    """
+    def decorator(method):
+        method._dataset = {'span': span, 'ttl': ttl, 'maxsize': maxsize, 'groups': groups, 'persist': persist}
+        return method
+    return decorator
+
+
+class DataService:
+    """Dueño único de los datasets y de sus índices derivados dentro del proceso.
+
+    Los blueprints de cantones y parroquias son vistas sobre esta instancia, de modo que
+    la población completa, el índice de clusters y los agregados se cargan una sola vez
+    por worker aunque se sirvan ambos mapas. geopandas, pandas y shapely se importan
+    dentro de los métodos para que el arranque del worker (y /health) no los espere.
+    """
+
+    def __init__(self, name="data", manager=cache):
+        self.manager = manager
+        for attr in dir(type(self)):
+            method = getattr(type(self), attr)
+            spec = getattr(method, '_dataset', None)
+            if spec is None:
+                continue
+            func = getattr(self, attr)
+            if spec['persist']:
+                func = results.persistent(groups=spec['groups'], **spec['persist'])(func)
+            if spec['span']:
+                func = timed(spec['span'])(func)
+            managed = manager.cached(
+                f"{name}.{attr}", ttl=spec['ttl'], maxsize=spec['maxsize'], groups=spec['groups']
+            )(func)
+            setattr(self, attr, managed)
+
+    # --- Datos base ---
+
+    @dataset(span="load_cantones", groups=CANTONES)
+    def load_cantones_data(self):
+        """Carga datos de cantones con cache"""
+        try:
+            from utils.aggregation import with_unit_codes
+            gdf_cantones = load_geojson_with_fallback("cantones.geojson", "cantones")
+            if gdf_cantones is not None:
+                set_dataset_size("cantones", len(gdf_cantones))
+            return with_unit_codes(gdf_cantones, 'cantones')
+        except Exception as e:
+            logger.error(f"Error cargando cantones: {e}")
+            return None
+
+    @dataset(span="load_cantones_boundaries", ttl=DEFAULT_TTL, maxsize=8, groups=CANTONES)
+    def load_cantones_boundaries(self, level):
+        """Carga límites de cantones pre-simplificados para dibujar en el mapa (cache por nivel)"""
+        try:
+            from utils.aggregation import with_unit_codes
+            return with_unit_codes(load_boundaries("cantones.geojson", level, "límites de cantones"), 'cantones')
+        except Exception as e:
+            logger.error(f"Error cargando límites de cantones: {e}")
+            return None
+
+    @dataset(span="load_parroquias", groups=PARROQUIAS)
+    def load_parroquias_data(self):
+        """Carga datos de parroquias con cache OPTIMIZADO (geometrías pre-simplificadas offline)"""
+        try:
+            from utils.aggregation import with_unit_codes
+            logger.info("🏛️  Cargando datos de parroquias...")
+            # Nivel de zoom 9: misma tolerancia (0.001°) que la simplificación anterior en tiempo de ejecución
+            gdf_parroquias = load_boundaries("parroquiasEcuador.geojson", 9, "parroquias")
+
+            if gdf_parroquias is not None:
+                logger.info(f"✅ Parroquias cargadas: {len(gdf_parroquias)} parroquias")
+                set_dataset_size("parroquias", len(gdf_parroquias))
+                logger.info(f"📋 Columnas disponibles: {list(gdf_parroquias.columns)}")
+
+            return with_unit_codes(gdf_parroquias, 'parroquias')
+        except Exception as e:
+            logger.error(f"❌ Error cargando parroquias: {e}")
+            return None
+
+    @dataset()
+    def load_ecuador_boundaries(self):
+        """Carga fronteras de Ecuador con cache"""
+        data_dir = get_data_directory()
+        if data_dir is None or not (data_dir / "ec.json").exists():
+            return None, None
+
+        try:
+            import geopandas as gpd
+            gdf_ecuador = gpd.read_file(data_dir / "ec.json")
+            return gdf_ecuador, gdf_ecuador.geometry.union_all()
+        except Exception as e:
+            logger.error(f"Error cargando fronteras: {e}")
+            return None, None
+
+    @dataset(span="load_population", persist={
+        'name': "poblacion_completa",
+        'inputs': POPULATION_INPUTS,
+    })
+    def load_all_population_data(self):
+        """Carga TODOS los datos de población REALISTAS, recortados a la frontera de Ecuador"""
+        try:
+            logger.info("🎯 Cargando datos REALISTAS de población...")
+            gdf_poblacion = load_geojson_with_fallback("poblacion_ecuador_realistic.geojson", "población realista")
+
+            if gdf_poblacion is not None:
+                gdf_ecuador, ecuador_union = self.load_ecuador_boundaries()
+                if gdf_ecuador is not None:
+                    from utils.clipping import clip_points
+                    gdf_poblacion = clip_points(gdf_poblacion, ecuador_union, gdf_ecuador.crs)
+                else:
+                    logger.warning("No se pudieron cargar fronteras de Ecuador; se usan todos los puntos")
+
+                # Estadísticas de los datos cargados
+                total_population = gdf_poblacion['population'].sum()
+                logger.info(f"✅ DATOS REALISTAS cargados: {len(gdf_poblacion):,} puntos")
+                set_dataset_size("poblacion", len(gdf_poblacion))
+                logger.info(f"🏘️  Población total REALISTA: {total_population:,.0f} habitantes")
+                logger.info(f"📊 Rango de población: {gdf_poblacion['population'].min():.1f} - {gdf_poblacion['population'].max():.1f}")
+
+            return gdf_poblacion
+
+        except Exception as e:
+            logger.error(f"❌ Error cargando datos realistas: {e}")
+            return None
+
+    # --- Datos derivados ---
+
+    @dataset(span="build_population_grid", persist={
+        'name': "mallas_poblacion",
+        'inputs': POPULATION_INPUTS,
+    })
+    def load_population_grid(self):
+        """Construye las tablas de sumas acumuladas de población con cache"""
+        gdf_poblacion = self.load_all_population_data()
+        if gdf_poblacion is None or len(gdf_poblacion) == 0:
+            return None
+
+        try:
+            logger.info("🧮 Construyendo mallas acumuladas de población...")
+            from utils.population_grid import MultiResolutionPopulationGrid
+            return MultiResolutionPopulationGrid.from_points(
+                gdf_poblacion.geometry.x.values,
+                gdf_poblacion.geometry.y.values,
+                gdf_poblacion['population'].values
+            )
+        except Exception as e:
+            logger.error(f"Error construyendo mallas de población: {e}")
+            return None
+
+    @dataset(span="build_cluster_index", persist={
+        'name': "indice_clusters",
+        'inputs': POPULATION_INPUTS,
+    })
+    def load_cluster_index(self):
+        """Índice jerárquico de clusters sobre TODOS los puntos de población (capa del mapa)"""
+        gdf_poblacion = self.load_all_population_data()
+        if gdf_poblacion is None or len(gdf_poblacion) == 0:
+            return None
+
+        try:
+            logger.info("🫧 Construyendo índice de clusters de población...")
+            from utils.clustering import ClusterIndex
+            return ClusterIndex.from_points(
+                gdf_poblacion.geometry.x.values,
+                gdf_poblacion.geometry.y.values,
+                gdf_poblacion['population'].values
+            )
+        except Exception as e:
+            logger.error(f"Error construyendo índice de clusters: {e}")
+            return None
+
+    @dataset(span="build_hex_grids", persist={
+        'name': "hexagonos_poblacion",
+        'inputs': POPULATION_INPUTS,
+    })
+    def load_hex_grids(self):
+        """Población en mallas hexagonales de todas las resoluciones ({lado en km: HexGrid})"""
+        gdf_poblacion = self.load_all_population_data()
+        if gdf_poblacion is None or len(gdf_poblacion) == 0:
+            return None
+
+        try:
+            logger.info("⬡ Construyendo mallas hexagonales de población...")
+            from utils.hexbin import build_hex_grids
+            return build_hex_grids(
+                gdf_poblacion.geometry.x.values,
+                gdf_poblacion.geometry.y.values,
+                gdf_poblacion['population'].values
+            )
+        except Exception as e:
+            logger.error(f"Error construyendo mallas hexagonales: {e}")
+            return None
+
+    @dataset(span="build_unit_locator")
+    def load_unit_locator(self):
+        """Índice de parroquias para geocodificación inversa (punto -> parroquia, cantón, provincia)"""
+        from utils.geocoding import UnitLocator
+        gdf_parroquias = self.load_parroquias_data()
+        if gdf_parroquias is None:
+            return None
+        return UnitLocator.from_units(
+            gdf_parroquias, self.load_cantones_data(),
+            self.calculate_population_by_parroquia(), self.load_unit_areas('parroquias')
+        )
+
+    @dataset(span="unit_stats", persist={
+        'name': "estadisticas_unidades",
+        'inputs': ("cantones.geojson", "parroquiasEcuador.geojson",
+                   "simplified/parroquiasEcuador_z9.geojson") + POPULATION_INPUTS,
+        'version': 3,
+    })
+    def load_unit_stats(self):
+        """Tablas columnares de estadísticas por unidad: {'cantones'|'parroquias'|'provincias': DataFrame}"""
+        from utils.aggregation import aggregate_points
+        from utils.provincias import canton_parent_positions
+        from utils.unit_stats import rollup_membership, unit_stats
+        gdf_poblacion = self.load_all_population_data()
+        if gdf_poblacion is None or len(gdf_poblacion) == 0:
+            return None
+
+        tables = {}
+        memberships = {}
+        for level, gdf_units in (('cantones', self.load_cantones_data()), ('parroquias', self.load_parroquias_data())):
+            if gdf_units is None:
+                continue
+            if gdf_units.crs != gdf_poblacion.crs:
+                gdf_units = gdf_units.to_crs(gdf_poblacion.crs)
+            totals, _, (pair_points, pair_units) = aggregate_points(gdf_units, gdf_poblacion)
+            memberships[level] = (totals, pair_points, pair_units)
+            tables[level] = unit_stats(gdf_units, gdf_poblacion, self.load_unit_areas(level), level, memberships[level])
+
+        # Provincias: pares punto-cantón reasignados a su provincia, sin un segundo cruce espacial,
+        # con los mismos totales que /api/population-by-provincia
+        gdf_provincias = self.load_provincias_data()
+        if 'cantones' in memberships and gdf_provincias is not None:
+            parents = canton_parent_positions(self.load_cantones_data(), gdf_provincias)
+            membership = rollup_membership(memberships['cantones'], parents, len(gdf_provincias))
+            tables['provincias'] = unit_stats(
+                gdf_provincias, gdf_poblacion, self.load_unit_areas('provincias'), 'provincias', membership
+            )
+        return tables
+
+    @dataset(span="unit_areas", maxsize=3)
+    def load_unit_areas(self, level):
+        """Área (km²) por código de las unidades de un nivel ('cantones', 'parroquias' o 'provincias')"""
+        from utils.choropleth import unit_areas_km2
+        loaders = {
+            'cantones': self.load_cantones_data,
+            'parroquias': self.load_parroquias_data,
+            'provincias': self.load_provincias_data,
+        }
+        gdf_units = loaders[level]()
+        if gdf_units is None:
+            return {}
+        return unit_areas_km2(gdf_units)
+
+    @dataset(span="tooltip_table", maxsize=3)
+    def load_tooltip_table(self, level):
+        """Nombre y población formateada por código de unidad (el id de las features del mapa)"""
+        from utils.tooltips import tooltip_table
+        if level == 'cantones':
+            return tooltip_table(self.calculate_population_by_canton())
+        if level == 'provincias':
+            return tooltip_table(self.calculate_population_by_provincia())
+        return tooltip_table(self.calculate_population_by_parroquia())
+
+    @dataset(span="aggregate_canton", groups=CANTONES, persist={
+        'name': "poblacion_por_canton",
+        'version': 2,
+        'inputs': ("cantones.geojson",) + POPULATION_INPUTS,
+    })
+    def calculate_population_by_canton(self):
+        """Calcula la población total por cantón usando TODOS los puntos (sin límite)"""
+        try:
+            logger.info("Calculando población por cantón usando TODOS los datos...")
+
+            # Cargar datos - USAR TODOS LOS PUNTOS, NO LOS LIMITADOS
+            gdf_cantones = self.load_cantones_data()
+            gdf_poblacion = self.load_all_population_data()
+
+            if gdf_cantones is None or gdf_poblacion is None:
+                logger.warning("No se pudieron cargar los datos necesarios")
+                return []
+
+            # Asegurar mismo CRS
+            if gdf_cantones.crs != gdf_poblacion.crs:
+                gdf_cantones = gdf_cantones.to_crs(gdf_poblacion.crs)
+
+            logger.info(f"Procesando {len(gdf_cantones)} cantones con {len(gdf_poblacion)} puntos de población COMPLETOS")
+
+            # Una sola consulta vectorizada al índice espacial de los puntos para todos los cantones
+            from utils.aggregation import aggregate_points, population_list as population_list_for
+            totals, candidates, _ = aggregate_points(gdf_cantones, gdf_poblacion)
+            population_list = population_list_for(gdf_cantones, totals, candidates, 'cantones')
+
+            # Log top 5 cantones
+            top_5_info = [f"{item['name']}: {item['population']:,}" for item in population_list[:5]]
+            logger.info(f"Top 5 cantones: {top_5_info}")
+
+            return population_list
+
+        except Exception as e:
+            logger.error(f"Error calculando población por cantón: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    @dataset(span="aggregate_parroquia", groups=PARROQUIAS, persist={
+        'name': "poblacion_por_parroquia",
+        'version': 2,
+        'inputs': ("parroquiasEcuador.geojson", "simplified/parroquiasEcuador_z9.geojson") + POPULATION_INPUTS,
+    })
+    def calculate_population_by_parroquia(self):
+        """Calcula la población total por parroquia usando TODOS los puntos (igual que cantones)"""
+        try:
+            logger.info("Calculando población por parroquia usando TODOS los datos...")
+
+            # Cargar datos - USAR TODOS LOS PUNTOS, NO LOS LIMITADOS
+            gdf_parroquias = self.load_parroquias_data()
+            gdf_poblacion = self.load_all_population_data()
+
+            if gdf_parroquias is None or gdf_poblacion is None:
+                logger.warning("No se pudieron cargar los datos necesarios")
+                return []
+
+            # Asegurar mismo CRS
+            if gdf_parroquias.crs != gdf_poblacion.crs:
+                gdf_parroquias = gdf_parroquias.to_crs(gdf_poblacion.crs)
+
+            logger.info(f"Procesando {len(gdf_parroquias)} parroquias con {len(gdf_poblacion)} puntos de población COMPLETOS")
+
+            # Una sola consulta vectorizada al índice espacial de los puntos para todas las parroquias
+            from utils.aggregation import aggregate_points, population_list as population_list_for
+            totals, candidates, _ = aggregate_points(gdf_parroquias, gdf_poblacion)
+            population_list = population_list_for(gdf_parroquias, totals, candidates, 'parroquias')
+
+            # Log top 5 parroquias
+            top_5_info = [f"{item['name']} ({item['provincia']}): {item['population']:,}" for item in population_list[:5]]
+            logger.info(f"Top 5 parroquias: {top_5_info}")
+
+            return population_list
+
+        except Exception as e:
+            logger.error(f"Error calculando población por parroquia: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    # --- Provincias (derivadas de los cantones) ---
+
+    @dataset(span="dissolve_provincias", groups=CANTONES, persist={
+        'name': "provincias_disueltas",
+        'inputs': ("cantones.geojson",),
+    })
+    def load_provincias_data(self):
+        """Provincias como unión de sus cantones, calculada una sola vez"""
+        from utils.provincias import dissolve_provincias
+        gdf_cantones = self.load_cantones_data()
+        if gdf_cantones is None:
+            return None
+        try:
+            return dissolve_provincias(gdf_cantones)
+        except Exception as e:
+            logger.error(f"Error construyendo provincias: {e}")
+            return None
+
+    @dataset(span="simplify_provincias", groups=CANTONES, persist={
+        'name': "limites_provincias",
+        'inputs': ("cantones.geojson",),
+    })
+    def load_provincias_boundaries(self):
+        """Límites de provincias en todos los niveles de simplificación: {nivel: GeoDataFrame}.
+
+        Se simplifican juntas con la topología compartida, igual que build_boundaries.py,
+        para que los bordes entre provincias vecinas coincidan en cada nivel.
+        """
+        from utils.data_loader import SIMPLIFICATION_LEVELS
+        from utils.topology import simplify_shared
+        gdf_provincias = self.load_provincias_data()
+        if gdf_provincias is None:
+            return None
+        simplified = simplify_shared(list(gdf_provincias.geometry), SIMPLIFICATION_LEVELS.values())
+        return {
+            level: gdf_provincias.set_geometry(list(simplified[tolerance]), crs=gdf_provincias.crs)
+            for level, tolerance in SIMPLIFICATION_LEVELS.items()
+        }
+
+    @dataset(span="aggregate_provincia", groups=CANTONES)
+    def calculate_population_by_provincia(self):
+        """Población por provincia sumando los agregados de cantones (sin cruce espacial)"""
+        from utils.provincias import canton_to_provincia, rollup_provincias
+        gdf_cantones = self.load_cantones_data()
+        gdf_provincias = self.load_provincias_data()
+        if gdf_cantones is None or gdf_provincias is None:
+            return []
+        return rollup_provincias(
+            self.calculate_population_by_canton(),
+            canton_to_provincia(gdf_cantones, gdf_provincias),
+            gdf_provincias
+        )
+
+    @dataset(groups=CANTONES)
+    def load_provincia_names(self):
+        """{DPA_PROVIN: DPA_DESPRO} ordenado por código, desde los cantones en cache"""
+        gdf_cantones = self.load_cantones_data()
+        if gdf_cantones is None:
+            raise ValueError("Cantones no disponibles")
+        missing = {'DPA_PROVIN', 'DPA_DESPRO'} - set(gdf_cantones.columns)
+        if missing:
+            raise ValueError(f"Los cantones no tienen {', '.join(sorted(missing))}")
+        return dict(sorted(zip(gdf_cantones['DPA_PROVIN'], gdf_cantones['DPA_DESPRO'])))
+
+    def warm_up(self):
+        """Importa las dependencias geoespaciales y carga los datasets base en segundo plano"""
+        try:
+            # folium no se usa aquí: solo se deja importado antes del primer renderizado
+            importlib.import_module("folium")
+            self.load_cantones_data()
+            self.load_cluster_index()
+            self.calculate_population_by_canton()
+            logger.info("🔥 Precalentamiento completado")
+        except Exception as e:
+            logger.warning(f"⚠️ Precalentamiento incompleto: {e}")
+
+    def clear(self, group=None):
+        """Limpia las cachés en memoria y los resultados persistidos de un grupo"""
+        return self.manager.clear(group=group) + results.clear(group=group)
+
+
+data_service = DataService()
@@ -0,0 +1,148 @@
+"""Geocodificación inversa: punto -> parroquia, cantón y provincia.
+
+El índice se construye una vez sobre las parroquias cargadas: un STRtree de sus
+polígonos (preparados) y arrays con los códigos y la densidad de cada parroquia. Un
+lote de coordenadas se resuelve con una consulta vectorizada al árbol por bbox y un
+`contains_xy` elemento a elemento sobre los pares candidatos, sin bucles en Python.
+"""
+import logging
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+from utils.aggregation import CODE_FIELD
+from utils.choropleth import DENSITY_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# Código de "sin unidad" en los arrays y en la respuesta binaria
+NO_UNIT = -1
+
+# Registro binario por punto: parroquia, cantón, provincia y clase de densidad
+RECORD_DTYPE = np.dtype([
+    ('parroquia', '<i4'), ('canton', '<i4'), ('provincia', '<i4'), ('density_class', '<i4'),
+])
+
+
+def _normalize(values):
+    return [str(v).strip().upper() for v in values]
+
+
+def density_classes(density):
+    """Índice en DENSITY_CLASSES de cada densidad (hab/km²); NO_UNIT si no hay densidad"""
+    bounds = np.array([upper for upper, _, _ in DENSITY_CLASSES[:-1]])
+    density = np.asarray(density, dtype=np.float64)
+    return np.where(np.isnan(density), NO_UNIT, np.searchsorted(bounds, density, side='right'))
+
+
+class UnitLocator:
+    """Índice de parroquias para ubicar puntos (lon, lat) en lote"""
+
+    def __init__(self, geometries, units):
+        self.geometries = geometries
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.units = units
+
+    @classmethod
+    def from_units(cls, gdf_parroquias, gdf_cantones, population_data, areas):
+        """Índice desde las parroquias y cantones cargados, los agregados y las áreas (km²) por código"""
+        gdf_parroquias = gdf_parroquias[gdf_parroquias.geometry.notna()]
+        codes = gdf_parroquias[CODE_FIELD].to_numpy(dtype=np.int64)
+
+        canton_names = gdf_parroquias['CANTON'].tolist() if 'CANTON' in gdf_parroquias.columns else [None] * len(codes)
+        provincia_names = gdf_parroquias['PROVINCIA'].tolist() if 'PROVINCIA' in gdf_parroquias.columns else [None] * len(codes)
+
+        # Cantón y provincia de cada parroquia: cruce por (provincia, cantón) con los cantones cargados
+        canton_codes = np.full(len(codes), NO_UNIT, dtype=np.int64)
+        provincia_codes = np.full(len(codes), NO_UNIT, dtype=np.int64)
+        if gdf_cantones is not None and {'DPA_DESPRO', 'DPA_DESCAN'} <= set(gdf_cantones.columns):
+            provincias = gdf_cantones['DPA_PROVIN'] if 'DPA_PROVIN' in gdf_cantones.columns else [None] * len(gdf_cantones)
+            cantones = dict(zip(
+                zip(_normalize(gdf_cantones['DPA_DESPRO']), _normalize(gdf_cantones['DPA_DESCAN'])),
+                zip(gdf_cantones[CODE_FIELD].tolist(), provincias)
+            ))
+            for i, key in enumerate(zip(_normalize(provincia_names), _normalize(canton_names))):
+                canton_code, provincia_code = cantones.get(key, (NO_UNIT, None))
+                canton_codes[i] = canton_code
+                try:
+                    provincia_codes[i] = int(provincia_code)
+                except (TypeError, ValueError):
+                    pass
+
+        population = {item['code']: item['population'] for item in population_data}
+        density = np.array([
+            population[code] / areas[code] if code in population and areas.get(code) else np.nan
+            for code in codes.tolist()
+        ])
+
+        units = {
+            'parroquia': codes,
+            'canton': canton_codes,
+            'provincia': provincia_codes,
+            'density': density,
+            'density_class': density_classes(density),
+            'parroquia_name': gdf_parroquias['PARROQUIA'].tolist() if 'PARROQUIA' in gdf_parroquias.columns else [None] * len(codes),
+            'canton_name': canton_names,
+            'provincia_name': provincia_names,
+        }
+        logger.info(f"📍 Índice de geocodificación: {len(codes)} parroquias")
+        return cls(np.asarray(gdf_parroquias.geometry.values), units)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def locate(self, lons, lats):
+        """Posición de la parroquia que contiene cada punto (NO_UNIT si ninguna)"""
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(lons), NO_UNIT, dtype=np.int64)
+        if len(lons) == 0:
+            return result
+
+        points, units = self.tree.query(shapely.points(lons, lats))
+        inside = shapely.contains_xy(self.geometries[units], lons[points], lats[points])
+        # Con parroquias superpuestas gana la primera (orden del archivo): asignar en orden inverso
+        order = np.flatnonzero(inside)[::-1]
+        result[points[order]] = units[order]
+
+        # Puntos sobre un borde: contains_xy los excluye, intersects_xy no
+        pending = np.isin(points, np.flatnonzero(result == NO_UNIT))
+        if pending.any():
+            edge = np.flatnonzero(pending)
+            on_edge = edge[shapely.intersects_xy(self.geometries[units[edge]], lons[points[edge]], lats[points[edge]])][::-1]
+            result[points[on_edge]] = units[on_edge]
+        return result
+
+    def records(self, positions):
+        """Array estructurado RECORD_DTYPE con códigos y clase de densidad por punto"""
+        found = positions != NO_UNIT
+        records = np.empty(len(positions), dtype=RECORD_DTYPE)
+        for field in RECORD_DTYPE.names:
+            records[field] = NO_UNIT
+            records[field][found] = self.units[field][positions[found]]
+        return records
+
+    def describe(self, position):
+        """Parroquia, cantón, provincia y densidad de una posición del índice (None si NO_UNIT)"""
+        if position == NO_UNIT:
+            return None
+        u = self.units
+        density = u['density'][position]
+        return {
+            'parroquia': {'code': int(u['parroquia'][position]), 'name': u['parroquia_name'][position]},
+            'canton': {'code': _code(u['canton'][position]), 'name': u['canton_name'][position]},
+            'provincia': {'code': _code(u['provincia'][position]), 'name': u['provincia_name'][position]},
+            'density': None if np.isnan(density) else round(float(density), 2),
+            'density_class': _code(u['density_class'][position]),
+        }
+
+    def legend(self, positions):
+        """{código de parroquia: descripción} de las parroquias presentes en un lote"""
+        return {
+            info['parroquia']['code']: info
+            for info in map(self.describe, np.unique(positions[positions != NO_UNIT]).tolist())
+        }
+
+
+def _code(value):
+    return None if value == NO_UNIT else int(value)
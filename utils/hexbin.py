@@ -0,0 +1,144 @@
+import math
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones disponibles: lado del hexágono en km, de gruesa a fina
+HEX_RESOLUTIONS = (50, 20, 10, 5, 2)
+
+# Proyección equirectangular en el ecuador (km por grado); en Ecuador (|lat| < 5.1°)
+# la distorsión de áreas es menor al 0.4%
+KM_PER_DEGREE_LON = 111.320
+KM_PER_DEGREE_LAT = 110.574
+
+SQRT3 = math.sqrt(3)
+
+
+def axial_round(q, r):
+    """Redondeo de coordenadas axiales fraccionarias al hexágono más cercano (vía coordenadas cúbicas)"""
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def points_to_axial(lons, lats, size_km):
+    """Índices axiales (q, r) de hexágonos de punta hacia arriba con lado `size_km`"""
+    x = np.asarray(lons, dtype=np.float64) * KM_PER_DEGREE_LON
+    y = np.asarray(lats, dtype=np.float64) * KM_PER_DEGREE_LAT
+    q = (SQRT3 / 3 * x - y / 3) / size_km
+    r = (2 / 3 * y) / size_km
+    return axial_round(q, r)
+
+
+class HexGrid:
+    """Población agregada en una malla hexagonal de lado `size_km` (solo hexágonos ocupados)"""
+
+    def __init__(self, q, r, population, counts, size_km):
+        self.q = q
+        self.r = r
+        self.population = population
+        self.counts = counts
+        self.size_km = float(size_km)
+
+    @classmethod
+    def from_points(cls, lons, lats, values, size_km):
+        q, r = points_to_axial(lons, lats, size_km)
+        # Clave única por hexágono: desplazar q y r a positivos y combinarlos en un int64
+        q0, r0 = q.min(), r.min()
+        width = int(r.max() - r0) + 1
+        keys = (q - q0) * width + (r - r0)
+        unique, inverse = np.unique(keys, return_inverse=True)
+
+        population = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64), minlength=len(unique))
+        counts = np.bincount(inverse, minlength=len(unique))
+        hex_q, hex_r = np.divmod(unique, width)
+        return cls(hex_q + q0, hex_r + r0, population, counts, size_km)
+
+    def __len__(self):
+        return len(self.q)
+
+    @property
+    def area_km2(self):
+        return 3 * SQRT3 / 2 * self.size_km ** 2
+
+    @property
+    def total(self):
+        return float(self.population.sum())
+
+    @property
+    def nbytes(self):
+        return self.q.nbytes + self.r.nbytes + self.population.nbytes + self.counts.nbytes
+
+    def centers(self):
+        """Centro (lon, lat) de cada hexágono"""
+        x = self.size_km * (SQRT3 * self.q + SQRT3 / 2 * self.r)
+        y = self.size_km * 1.5 * self.r
+        return x / KM_PER_DEGREE_LON, y / KM_PER_DEGREE_LAT
+
+    def polygons(self):
+        """Vértices (n, 7, 2) en lon/lat de cada hexágono, con el anillo cerrado"""
+        lons, lats = self.centers()
+        angles = np.radians(30 + 60 * np.arange(7))
+        dx = self.size_km * np.cos(angles) / KM_PER_DEGREE_LON
+        dy = self.size_km * np.sin(angles) / KM_PER_DEGREE_LAT
+        return np.stack([lons[:, None] + dx, lats[:, None] + dy], axis=-1)
+
+    def select(self, bbox=None):
+        """Índices de los hexágonos cuyo centro cae en (min_lon, min_lat, max_lon, max_lat)"""
+        if bbox is None:
+            return np.arange(len(self))
+        lons, lats = self.centers()
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return np.flatnonzero((lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat))
+
+    def features(self, bbox=None):
+        """Features GeoJSON (polígonos) con población, puntos y densidad (hab/km²)"""
+        ids = self.select(bbox)
+        rings = np.round(self.polygons()[ids], 5).tolist()
+        area = self.area_km2
+        return [
+            {
+                'type': 'Feature',
+                'id': f"{q},{r}",
+                'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                'properties': {
+                    'population': int(round(population)),
+                    'points_count': int(count),
+                    'density': round(population / area, 2),
+                },
+            }
+            for q, r, population, count, ring in zip(
+                self.q[ids].tolist(), self.r[ids].tolist(),
+                self.population[ids].tolist(), self.counts[ids].tolist(), rings
+            )
+        ]
+
+
+def build_hex_grids(lons, lats, values, resolutions=HEX_RESOLUTIONS):
+    """Mallas hexagonales de todas las resoluciones: {lado en km: HexGrid}"""
+    grids = {}
+    for size_km in resolutions:
+        grids[size_km] = HexGrid.from_points(lons, lats, values, size_km)
+        logger.info(f"⬡ Hexágonos de {size_km} km: {len(grids[size_km]):,} ocupados")
+    return grids
+
+
+def population_layers(hex_arg, coropletas=False):
+    """Capas de población de las páginas de mapa (capa_hex, capa_poblacion) según ?hex=<km>.
+
+    Una resolución que no está en HEX_RESOLUTIONS se ignora y se usa la capa por defecto
+    (clusters, o ninguna con coropletas) en lugar de una capa que /api/hexbin rechaza.
+    """
+    try:
+        capa_hex = int(hex_arg) if hex_arg else None
+    except ValueError:
+        capa_hex = None
+    if capa_hex not in HEX_RESOLUTIONS:
+        capa_hex = None
+    return {'capa_hex': capa_hex, 'capa_poblacion': not (capa_hex or coropletas)}
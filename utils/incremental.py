@@ -0,0 +1,259 @@
+"""Refresco incremental de los agregados cuando cambia una versión de los datos.
+
+Se guarda una instantánea de la versión anterior (claves y valores de los puntos,
+hash de cada geometría administrativa, pares punto-unidad y malla acumulada). Al
+refrescar se compara la nueva versión con la instantánea y solo se repite el
+trabajo espacial de lo que cambió:
+
+- unidades con geometría nueva o modificada: se recalculan completas;
+- puntos agregados o movidos: se ubican contra el índice de unidades;
+- puntos eliminados o con otro valor: se reutilizan los pares guardados.
+
+Los resultados se escriben en la cache persistente con la clave de los datos nuevos,
+de modo que la aplicación los sirve sin recalcular al arrancar.
+"""
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.strtree import STRtree
+from utils.aggregation import unit_membership, totals_from_pairs, population_list
+from utils.population_grid import MultiResolutionPopulationGrid
+from utils.result_store import results
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = "snapshot_incremental"
+SNAPSHOT_KEY = "latest"
+SNAPSHOT_VERSION = 1
+
+# Columnas que identifican un punto entre versiones; sin ellas se usan las coordenadas
+POINT_ID_COLUMNS = ("id", "point_id", "ID")
+COORDINATE_SCALE = 1e7
+
+# Nivel -> (método de DataService que carga las unidades, resultado persistido)
+LEVEL_SOURCES = {
+    'cantones': ('load_cantones_data', "poblacion_por_canton"),
+    'parroquias': ('load_parroquias_data', "poblacion_por_parroquia"),
+}
+GRID_RESULT = "mallas_poblacion"
+
+
+def _with_occurrence(keys):
+    """Hace únicas las claves repetidas agregando su número de aparición"""
+    keys = pd.Series(keys, dtype=str)
+    return (keys + "#" + keys.groupby(keys).cumcount().astype(str)).to_numpy()
+
+
+def point_keys(gdf_points):
+    """Identificador estable de cada punto: columna de id si existe, si no coordenadas cuantizadas"""
+    for column in POINT_ID_COLUMNS:
+        if column in gdf_points.columns:
+            return _with_occurrence(gdf_points[column].astype(str))
+    qx = np.round(gdf_points.geometry.x.to_numpy() * COORDINATE_SCALE).astype(np.int64)
+    qy = np.round(gdf_points.geometry.y.to_numpy() * COORDINATE_SCALE).astype(np.int64)
+    return _with_occurrence(pd.Series(qx).astype(str) + "," + pd.Series(qy).astype(str))
+
+
+def unit_hashes(gdf_units):
+    """sha1 del WKB de cada geometría (con número de aparición para geometrías repetidas)"""
+    wkb = shapely.to_wkb(gdf_units.geometry.values, hex=False)
+    return _with_occurrence([hashlib.sha1(w).hexdigest() if w is not None else "none" for w in wkb])
+
+
+def _population_grid(x, y, population):
+    return MultiResolutionPopulationGrid.from_points(x, y, population)
+
+
+class RefreshStats(dict):
+    """Resumen del refresco (conteos de cambios por tipo y por nivel)"""
+
+    def describe(self):
+        levels = ", ".join(
+            f"{level}: {info['changed_units']} unidades modificadas, {info['affected_units']} totales afectados"
+            for level, info in self.get('levels', {}).items()
+        )
+        return (f"{self['mode']}: +{self.get('added', 0)} / -{self.get('removed', 0)} / "
+                f"~{self.get('moved', 0)} movidos / {self.get('value_changed', 0)} con otro valor; {levels}")
+
+
+def _full_level(gdf_units, gdf_points, point_tree):
+    pair_points, pair_units, candidates = unit_membership(gdf_units.geometry.values, point_tree)
+    return {
+        'unit_hashes': unit_hashes(gdf_units),
+        'pair_points': pair_points,
+        'pair_units': pair_units,
+        'candidates': candidates,
+    }, len(gdf_units)
+
+
+def _incremental_level(old, gdf_units, point_geoms, point_tree_factory, old_points, old_to_new, added, value_changed):
+    """Actualiza pares y candidatos de un nivel; devuelve (nivel, unidades modificadas, unidades afectadas)"""
+    new_hashes = unit_hashes(gdf_units)
+    n_units = len(gdf_units)
+    unit_match = pd.Index(old['unit_hashes']).get_indexer(new_hashes)
+    kept_units = unit_match >= 0
+    changed_units = np.flatnonzero(~kept_units)
+
+    old_unit_to_new = np.full(len(old['unit_hashes']), -1, dtype=np.int64)
+    old_unit_to_new[unit_match[kept_units]] = np.flatnonzero(kept_units)
+
+    # Pares conservados: punto y unidad siguen existiendo sin cambios de posición/geometría
+    mapped_points = old_to_new[old['pair_points']]
+    mapped_units = old_unit_to_new[old['pair_units']]
+    keep = (mapped_points >= 0) & (mapped_units >= 0)
+    lost_units = mapped_units[(mapped_points < 0) & (mapped_units >= 0)]
+    pair_points = [mapped_points[keep]]
+    pair_units = [mapped_units[keep]]
+
+    candidates = np.zeros(n_units, dtype=np.int64)
+    candidates[kept_units] = old['candidates'][unit_match[kept_units]]
+
+    unit_tree = STRtree(np.asarray(gdf_units.geometry.values))
+
+    # Candidatos por bbox de las unidades sin cambios: restar puntos que salen, sumar los que entran
+    removed_old = np.flatnonzero(old_to_new < 0)
+    if len(removed_old):
+        removed_geoms = shapely.points(old_points['x'][removed_old], old_points['y'][removed_old])
+        _, hit_units = unit_tree.query(removed_geoms)
+        hit_units = hit_units[kept_units[hit_units]]
+        candidates -= np.bincount(hit_units, minlength=n_units)
+
+    added_pairs_units = np.empty(0, dtype=np.int64)
+    if len(added):
+        _, hit_units = unit_tree.query(point_geoms[added])
+        hit_units = hit_units[kept_units[hit_units]]
+        candidates += np.bincount(hit_units, minlength=n_units)
+
+        # Pertenencia de los puntos nuevos a las unidades sin cambios
+        local, units = unit_tree.query(point_geoms[added], predicate='intersects')
+        mask = kept_units[units]
+        pair_points.append(added[local[mask]])
+        pair_units.append(units[mask])
+        added_pairs_units = units[mask]
+
+    # Unidades nuevas o con geometría modificada: recálculo completo contra todos los puntos
+    if len(changed_units):
+        changed_points, changed_pair_units, changed_candidates = unit_membership(
+            gdf_units.geometry.values[changed_units], point_tree_factory()
+        )
+        pair_points.append(changed_points)
+        pair_units.append(changed_units[changed_pair_units])
+        candidates[changed_units] = changed_candidates
+
+    pair_points = np.concatenate(pair_points)
+    pair_units = np.concatenate(pair_units)
+
+    value_changed_units = pair_units[np.isin(pair_points, value_changed)] if len(value_changed) else np.empty(0, dtype=np.int64)
+    affected = np.unique(np.concatenate([changed_units, lost_units, added_pairs_units, value_changed_units]))
+
+    level = {
+        'unit_hashes': new_hashes,
+        'pair_points': pair_points,
+        'pair_units': pair_units,
+        'candidates': candidates,
+    }
+    return level, len(changed_units), len(affected)
+
+
+def refresh(service, full=False):
+    """Refresca los agregados persistidos a partir de la instantánea de la versión anterior"""
+    outputs = [result for _, result in LEVEL_SOURCES.values()] + [GRID_RESULT]
+    current_keys = {name: results.key_for(name) for name in outputs}
+
+    found, snapshot = results.load(SNAPSHOT_NAME, SNAPSHOT_KEY)
+    if found and snapshot.get('version') != SNAPSHOT_VERSION:
+        found, snapshot = False, None
+
+    if found and not full and snapshot['keys'] == current_keys and all(results.get(name)[0] for name in outputs):
+        logger.info("✅ Datos sin cambios desde el último refresco")
+        return RefreshStats(mode="sin cambios")
+
+    gdf_points = service.load_all_population_data()
+    if gdf_points is None or len(gdf_points) == 0:
+        raise RuntimeError("No se pudieron cargar los datos de población")
+
+    keys = point_keys(gdf_points)
+    x = gdf_points.geometry.x.to_numpy()
+    y = gdf_points.geometry.y.to_numpy()
+    population = gdf_points['population'].to_numpy(dtype=np.float64)
+    point_geoms = np.asarray(gdf_points.geometry.values)
+
+    point_tree = None
+
+    def get_point_tree():
+        nonlocal point_tree
+        if point_tree is None:
+            point_tree = STRtree(point_geoms)
+        return point_tree
+
+    incremental = found and not full
+    stats = RefreshStats(mode="incremental" if incremental else "completo", levels={})
+
+    if incremental:
+        old_points = snapshot['points']
+        match = pd.Index(old_points['keys']).get_indexer(keys)
+        matched = match >= 0
+        moved = np.zeros(len(keys), dtype=bool)
+        moved[matched] = (old_points['x'][match[matched]] != x[matched]) | (old_points['y'][match[matched]] != y[matched])
+        kept = matched & ~moved
+        value_changed = np.flatnonzero(kept & (old_points['population'][np.where(kept, match, 0)] != population))
+        added = np.flatnonzero(~kept)
+
+        old_to_new = np.full(len(old_points['keys']), -1, dtype=np.int64)
+        old_to_new[match[kept]] = np.flatnonzero(kept)
+        removed_old = np.flatnonzero(old_to_new < 0)
+
+        stats.update(added=int((~matched).sum()), moved=int(moved.sum()),
+                     removed=int(len(removed_old) - moved.sum()), value_changed=len(value_changed))
+        logger.info(f"🔍 Diferencias de puntos: {stats.describe()}")
+    else:
+        old_points = None
+
+    levels = {}
+    for level, (loader, result_name) in LEVEL_SOURCES.items():
+        gdf_units = getattr(service, loader)()
+        if gdf_units is None:
+            raise RuntimeError(f"No se pudieron cargar las unidades de {level}")
+
+        if incremental and level in snapshot['levels']:
+            levels[level], changed, affected = _incremental_level(
+                snapshot['levels'][level], gdf_units, point_geoms, get_point_tree,
+                old_points, old_to_new, added, value_changed
+            )
+        else:
+            levels[level], changed = _full_level(gdf_units, gdf_points, get_point_tree())
+            affected = changed
+
+        totals = totals_from_pairs(levels[level]['pair_points'], levels[level]['pair_units'], population, len(gdf_units))
+        results.put(result_name, population_list(gdf_units, totals, levels[level]['candidates'], level))
+        stats['levels'][level] = {'changed_units': int(changed), 'affected_units': int(affected), 'units': len(gdf_units)}
+
+    # Malla acumulada: aplicar solo las diferencias si la extensión de los puntos no cambió
+    bounds = (float(x.min()), float(y.min()), float(x.max()), float(y.max()))
+    if incremental and snapshot.get('grid') is not None and snapshot['grid'].bounds == bounds:
+        removed_old = np.flatnonzero(old_to_new < 0)
+        old_population = old_points['population']
+        grid = snapshot['grid'].with_deltas(
+            np.concatenate([old_points['x'][removed_old], x[added], x[value_changed]]),
+            np.concatenate([old_points['y'][removed_old], y[added], y[value_changed]]),
+            np.concatenate([
+                -old_population[removed_old],
+                population[added],
+                population[value_changed] - old_population[match[value_changed]],
+            ])
+        )
+    else:
+        grid = _population_grid(x, y, population)
+    results.put(GRID_RESULT, grid)
+
+    results.save(SNAPSHOT_NAME, SNAPSHOT_KEY, {
+        'version': SNAPSHOT_VERSION,
+        'keys': current_keys,
+        'points': {'keys': keys, 'x': x, 'y': y, 'population': population},
+        'levels': levels,
+        'grid': grid,
+    })
+    logger.info(f"✅ Refresco {stats.describe()}")
+    return stats
@@ -0,0 +1,174 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+# Buckets (segundos) para los histogramas de duración
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Registro en memoria de histogramas, contadores y gauges con salida en formato Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """Fija el total de un contador mantenido fuera del registro (p. ej. cache_info)"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_collector(self, collector):
+        """Registra una función que actualiza métricas justo antes de cada lectura de /metrics"""
+        self._collectors.append(collector)
+
+    def render_prometheus(self):
+        for collector in self._collectors:
+            collector(self)
+
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({key[0] for key in series}):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (metric, labels), value in sorted(series.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({key[0] for key in self._histograms}):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("mapa_span_seconds", "Duración de las etapas instrumentadas (carga, agregación, folium, render)")
+registry.describe("mapa_request_duration_seconds", "Duración total de las peticiones HTTP por endpoint")
+registry.describe("mapa_cache_hits_total", "Aciertos de cache por función cacheada")
+registry.describe("mapa_cache_misses_total", "Fallos de cache por función cacheada")
+registry.describe("mapa_cache_coalesced_total", "Llamadas concurrentes que esperaron un cálculo ya en curso")
+registry.describe("mapa_cache_evictions_total", "Entradas expulsadas por maxsize o por el presupuesto de memoria")
+registry.describe("mapa_cache_entries", "Entradas actualmente en cache por función cacheada")
+registry.describe("mapa_cache_bytes", "Memoria estimada de cada caché registrada")
+registry.describe("mapa_dataset_rows", "Filas de cada conjunto de datos cargado")
+
+
+@contextmanager
+def span(name):
+    """Mide un bloque; se acumula en el histograma y en el Server-Timing de la petición actual"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("mapa_span_seconds", elapsed, span=name)
+        if has_request_context():
+            spans = g.setdefault('timing_spans', {})
+            spans[name] = spans.get(name, 0.0) + elapsed
+
+
+def timed(name):
+    """Decorador equivalente a `span` para funciones completas"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_dataset_size(dataset, rows):
+    registry.set_gauge("mapa_dataset_rows", int(rows), dataset=dataset)
+
+
+def init_app(app):
+    """Agrega Server-Timing a cada respuesta y registra el endpoint /metrics"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        registry.observe(
+            "mapa_request_duration_seconds", total,
+            endpoint=request.endpoint or "none", status=response.status_code
+        )
+        entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in g.get('timing_spans', {}).items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response.headers['Server-Timing'] = ", ".join(entries)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas en formato de texto de Prometheus"""
+        return app.response_class(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,140 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones (grados por celda) de las tablas de sumas acumuladas, de gruesa a fina
+GRID_RESOLUTIONS = (0.1, 0.05, 0.01)
+
+
+class PopulationGrid:
+    """Tabla de sumas acumuladas (summed-area table) de población sobre una malla regular.
+
+    Cualquier rectángulo alineado a los ejes se resuelve con cuatro lecturas de la
+    tabla, sin importar cuántos puntos de población existan.
+    """
+
+    def __init__(self, cells, min_lon, min_lat, cell_size):
+        self.cell_size = float(cell_size)
+        self.min_lon = float(min_lon)
+        self.min_lat = float(min_lat)
+        self.n_rows, self.n_cols = cells.shape
+        self.max_lon = self.min_lon + self.n_cols * self.cell_size
+        self.max_lat = self.min_lat + self.n_rows * self.cell_size
+
+        # Fila y columna de ceros al inicio para que sat[i, j] = suma de cells[:i, :j]
+        self.sat = np.zeros((self.n_rows + 1, self.n_cols + 1), dtype=np.float64)
+        np.cumsum(np.cumsum(cells, axis=0, dtype=np.float64), axis=1, out=self.sat[1:, 1:])
+
+    @classmethod
+    def from_points(cls, lons, lats, values, cell_size, bounds=None):
+        """Construye la malla acumulando puntos de población en celdas de `cell_size` grados"""
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+
+        if bounds is None:
+            bounds = (lons.min(), lats.min(), lons.max(), lats.max())
+        min_lon, min_lat, max_lon, max_lat = bounds
+
+        n_cols = max(1, int(np.ceil((max_lon - min_lon) / cell_size)) + 1)
+        n_rows = max(1, int(np.ceil((max_lat - min_lat) / cell_size)) + 1)
+
+        cols = np.clip(((lons - min_lon) / cell_size).astype(np.int64), 0, n_cols - 1)
+        rows = np.clip(((lats - min_lat) / cell_size).astype(np.int64), 0, n_rows - 1)
+
+        cells = np.bincount(rows * n_cols + cols, weights=values, minlength=n_rows * n_cols)
+        return cls(cells.reshape(n_rows, n_cols), min_lon, min_lat, cell_size)
+
+    @classmethod
+    def from_raster(cls, array, min_lon, max_lat, cell_size):
+        """Construye la malla desde un raster (p. ej. LandScan) con origen en la esquina superior izquierda"""
+        cells = np.nan_to_num(np.asarray(array, dtype=np.float64), nan=0.0)
+        cells[cells < 0] = 0.0  # LandScan usa valores negativos como nodata
+        # Los rasters crecen hacia el sur; la malla crece hacia el norte
+        cells = cells[::-1]
+        min_lat = max_lat - cells.shape[0] * cell_size
+        return cls(cells, min_lon, min_lat, cell_size)
+
+    @property
+    def total(self):
+        return float(self.sat[-1, -1])
+
+    @property
+    def cells(self):
+        """Población por celda reconstruida desde la tabla acumulada"""
+        return np.diff(np.diff(self.sat, axis=0), axis=1)
+
+    def with_deltas(self, lons, lats, values):
+        """Nueva malla sumando `values` en las celdas de los puntos dados (refresco incremental)"""
+        cols = np.clip(((np.asarray(lons, dtype=np.float64) - self.min_lon) / self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+        rows = np.clip(((np.asarray(lats, dtype=np.float64) - self.min_lat) / self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+        cells = self.cells
+        np.add.at(cells, (rows, cols), np.asarray(values, dtype=np.float64))
+        return PopulationGrid(cells, self.min_lon, self.min_lat, self.cell_size)
+
+    @property
+    def nbytes(self):
+        return self.sat.nbytes
+
+    def _cumulative(self, lon, lat):
+        """Suma acumulada hasta (lon, lat) interpolando dentro de la celda (densidad uniforme por celda)"""
+        col = min(max((lon - self.min_lon) / self.cell_size, 0.0), float(self.n_cols))
+        row = min(max((lat - self.min_lat) / self.cell_size, 0.0), float(self.n_rows))
+
+        c0, r0 = int(col), int(row)
+        c1, r1 = min(c0 + 1, self.n_cols), min(r0 + 1, self.n_rows)
+        fc, fr = col - c0, row - r0
+
+        sat = self.sat
+        return ((1 - fr) * ((1 - fc) * sat[r0, c0] + fc * sat[r0, c1]) +
+                fr * ((1 - fc) * sat[r1, c0] + fc * sat[r1, c1]))
+
+    def rectangle_total(self, min_lon, min_lat, max_lon, max_lat):
+        """Población total dentro del rectángulo [min_lon, max_lon] x [min_lat, max_lat]"""
+        if max_lon <= min_lon or max_lat <= min_lat:
+            return 0.0
+        total = (self._cumulative(max_lon, max_lat) - self._cumulative(min_lon, max_lat) -
+                 self._cumulative(max_lon, min_lat) + self._cumulative(min_lon, min_lat))
+        return max(float(total), 0.0)
+
+
+class MultiResolutionPopulationGrid:
+    """Conjunto de mallas acumuladas a varias resoluciones sobre la misma extensión"""
+
+    def __init__(self, grids, bounds=None):
+        self.grids = sorted(grids, key=lambda g: g.cell_size)
+        self.bounds = bounds  # Extensión de los puntos usada para alinear las celdas
+
+    @classmethod
+    def from_points(cls, lons, lats, values, resolutions=GRID_RESOLUTIONS):
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        bounds = (lons.min(), lats.min(), lons.max(), lats.max())
+        grids = [PopulationGrid.from_points(lons, lats, values, size, bounds) for size in resolutions]
+        for grid in grids:
+            logger.info(f"🧮 Malla acumulada {grid.cell_size}°: {grid.n_rows}x{grid.n_cols} celdas ({grid.nbytes / 1e6:.1f} MB)")
+        return cls(grids, tuple(float(b) for b in bounds))
+
+    def with_deltas(self, lons, lats, values):
+        return MultiResolutionPopulationGrid([g.with_deltas(lons, lats, values) for g in self.grids], self.bounds)
+
+    @property
+    def nbytes(self):
+        return sum(g.nbytes for g in self.grids)
+
+    @property
+    def resolutions(self):
+        return [g.cell_size for g in self.grids]
+
+    def select(self, resolution=None):
+        """Devuelve la malla más fina con celda >= `resolution` (por defecto la más fina)"""
+        if resolution is None:
+            return self.grids[0]
+        for grid in self.grids:
+            if grid.cell_size >= resolution:
+                return grid
+        return self.grids[-1]
+
+    def rectangle_total(self, min_lon, min_lat, max_lon, max_lat, resolution=None):
+        return self.select(resolution).rectangle_total(min_lon, min_lat, max_lon, max_lat)
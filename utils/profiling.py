@@ -0,0 +1,151 @@
+import hmac
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from flask import abort, g, jsonify, request
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Profiler estadístico: muestrea periódicamente la pila de un hilo desde un hilo auxiliar"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        module = frame.f_globals.get('__name__') or os.path.basename(code.co_filename)
+        return f"{module}:{code.co_name}"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def collapsed(self):
+        """Pilas en formato 'collapsed' (flamegraph.pl, speedscope, inferno)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+class ProfileStore:
+    """Buffer circular con los últimos N perfiles"""
+
+    def __init__(self, max_profiles):
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            profile['id'] = next(self._ids)
+            self._profiles.append(profile)
+        return profile['id']
+
+    def list(self):
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != 'collapsed'} for p in reversed(self._profiles)]
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((p for p in self._profiles if p['id'] == profile_id), None)
+
+
+def _token_ok(app):
+    """Valida el token de administración desde cabecera o query param (sin token nunca es válido)"""
+    expected = app.config.get('PROFILING_TOKEN')
+    if not expected:
+        return False
+    provided = request.headers.get('X-Profile-Token') or request.args.get('profile_token') or ''
+    return hmac.compare_digest(provided, expected)
+
+
+def init_app(app):
+    """Activa el perfilado por petición (?profile=1 o X-Profile: 1) si PROFILING_ENABLED está activo"""
+    store = ProfileStore(app.config.get('PROFILING_MAX_PROFILES', 20))
+    app.extensions['profile_store'] = store
+    # Las pilas y rutas guardadas no se exponen sin token: sin PROFILING_TOKEN no se perfila
+    enabled = bool(app.config.get('PROFILING_ENABLED') and app.config.get('PROFILING_TOKEN'))
+    if app.config.get('PROFILING_ENABLED') and not enabled:
+        logger.warning("⚠️ PROFILING_ENABLED sin PROFILING_TOKEN: perfilado desactivado")
+
+    def stored_path():
+        """Ruta de la petición sin el token de administración"""
+        args = [(k, v) for k, v in request.args.items(multi=True) if k != 'profile_token']
+        return f"{request.path}?{urlencode(args)}" if args else request.path
+
+    def requested():
+        return request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+
+    @app.before_request
+    def start_profiling():
+        if not enabled or not requested() or not _token_ok(app):
+            return
+        g.profiler = StackSampler(threading.get_ident(), app.config.get('PROFILING_INTERVAL', 0.005)).start()
+        g.profile_start = time.perf_counter()
+
+    @app.after_request
+    def stop_profiling(response):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return response
+        sampler.stop()
+        profile_id = store.add({
+            'path': stored_path(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'duration_ms': round((time.perf_counter() - g.profile_start) * 1000, 1),
+            'samples': sampler.samples,
+            'interval_ms': sampler.interval * 1000,
+            'collapsed': sampler.collapsed(),
+        })
+        response.headers['X-Profile-Id'] = str(profile_id)
+        return response
+
+    def guard():
+        if not enabled:
+            abort(404)
+        if not _token_ok(app):
+            abort(403)
+
+    @app.route('/admin/profiles')
+    def list_profiles():
+        """Lista de perfiles guardados (sin las pilas)"""
+        guard()
+        return jsonify({'success': True, 'data': store.list()})
+
+    @app.route('/admin/profiles/<int:profile_id>')
+    def get_profile(profile_id):
+        """Pilas colapsadas de un perfil, listas para generar un flamegraph"""
+        guard()
+        profile = store.get(profile_id)
+        if profile is None:
+            return jsonify({'success': False, 'error': 'Perfil no encontrado'}), 404
+        return app.response_class(profile['collapsed'], mimetype='text/plain')
@@ -0,0 +1,80 @@
+"""Nivel provincial derivado de los cantones.
+
+Las provincias no tienen archivo propio: sus límites se obtienen una vez uniendo
+(dissolve) los cantones de cada provincia y sus totales se suman desde los agregados
+de cantones a través de la jerarquía DPA (cantón -> provincia), sin volver a cruzar
+los puntos de población con geometrías.
+"""
+import logging
+import numpy as np
+from shapely.validation import make_valid
+from utils.aggregation import CODE_FIELD, with_unit_codes
+
+logger = logging.getLogger(__name__)
+
+# Campo que agrupa los cantones por provincia: el código DPA y, si falta, el nombre
+PROVINCE_GROUP_FIELDS = ('DPA_PROVIN', 'DPA_DESPRO')
+
+
+def province_group_field(gdf_cantones):
+    for field in PROVINCE_GROUP_FIELDS:
+        if field in gdf_cantones.columns:
+            return field
+    raise ValueError("Los cantones no tienen DPA_PROVIN ni DPA_DESPRO")
+
+
+def dissolve_provincias(gdf_cantones):
+    """Provincias (geometría, DPA_PROVIN, DPA_DESPRO y código entero) como unión de sus cantones"""
+    field = province_group_field(gdf_cantones)
+    columns = [c for c in PROVINCE_GROUP_FIELDS if c in gdf_cantones.columns]
+    gdf_cantones = gdf_cantones[columns + ['geometry']]
+    # Algunos cantones traen anillos inválidos: se reparan antes de la unión
+    invalid = ~gdf_cantones.geometry.is_valid
+    if invalid.any():
+        gdf_cantones = gdf_cantones.copy()
+        gdf_cantones.loc[invalid, 'geometry'] = gdf_cantones.geometry[invalid].apply(make_valid)
+    gdf_provincias = gdf_cantones.dissolve(by=field, as_index=False, aggfunc='first')
+    gdf_provincias = gdf_provincias.sort_values(field).reset_index(drop=True)
+    logger.info(f"🗺️ Provincias: {len(gdf_provincias)} a partir de {len(gdf_cantones)} cantones")
+    return with_unit_codes(gdf_provincias, 'provincias')
+
+
+def canton_to_provincia(gdf_cantones, gdf_provincias):
+    """{código de cantón: código de provincia} según el campo de agrupación"""
+    field = province_group_field(gdf_cantones)
+    provincias = dict(zip(gdf_provincias[field].tolist(), gdf_provincias[CODE_FIELD].tolist()))
+    return {
+        canton: provincias[group]
+        for canton, group in zip(gdf_cantones[CODE_FIELD].tolist(), gdf_cantones[field].tolist())
+        if group in provincias
+    }
+
+
+def canton_parent_positions(gdf_cantones, gdf_provincias):
+    """Posición en `gdf_provincias` de la provincia de cada cantón (-1 si no tiene), en orden de cantones"""
+    parents = canton_to_provincia(gdf_cantones, gdf_provincias)
+    positions = {code: i for i, code in enumerate(gdf_provincias[CODE_FIELD].tolist())}
+    return np.array(
+        [positions.get(parents.get(code), -1) for code in gdf_cantones[CODE_FIELD].tolist()],
+        dtype=np.int64
+    )
+
+
+def rollup_provincias(canton_data, parents, gdf_provincias):
+    """Agregados por provincia sumando los de sus cantones en O(unidades), ordenados de mayor a menor"""
+    names = dict(zip(gdf_provincias[CODE_FIELD].tolist(), gdf_provincias['DPA_DESPRO'].tolist()
+                     if 'DPA_DESPRO' in gdf_provincias.columns else gdf_provincias[CODE_FIELD].tolist()))
+    totals = {code: {'code': code, 'name': name, 'population': 0, 'points_count': 0, 'cantones': 0}
+              for code, name in names.items()}
+    for item in canton_data:
+        entry = totals.get(parents.get(item['code']))
+        if entry is None:
+            continue
+        entry['population'] += item['population']
+        entry['points_count'] += item['points_count']
+        entry['cantones'] += 1
+
+    population_list = sorted(totals.values(), key=lambda x: x['population'], reverse=True)
+    for entry in population_list:
+        entry['formatted_population'] = f"{entry['population']:,}".replace(',', '.')
+    return population_list
@@ -0,0 +1,248 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from utils.data_loader import get_data_directory, get_compressed_entry
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Cabecera de cada archivo: línea JSON con metadatos y sha256 del contenido, seguida del pickle
+MAGIC = b"MAPA-RESULT-1\n"
+CACHE_SUBDIR = "cache"
+INPUT_INDEX = "input-hashes.json"
+
+registry.describe("mapa_result_cache_total", "Lecturas de la cache persistente de resultados por resultado (hit, miss, corrupt)")
+
+
+def _is_empty(value):
+    """Los resultados vacíos (error al calcular) no se persisten"""
+    if value is None:
+        return True
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+def _write_atomic(path, data):
+    """Escribe en un temporal del mismo directorio y lo renombra (os.replace es atómico)"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class ResultStore:
+    """Cache persistente en disco de resultados costosos (agregados, muestra del mapa).
+
+    La clave de cada resultado combina el nombre, la versión del algoritmo, el sha256 de
+    los archivos de entrada y los parámetros adicionales, de modo que cambiar los datos o
+    el algoritmo invalida el resultado sin intervención manual. Los hashes de entrada se
+    memorizan por (tamaño, mtime) para no releer archivos grandes en cada arranque.
+    """
+
+    def __init__(self, directory=None, enabled=True):
+        self.directory = Path(directory) if directory else None
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._input_hashes = None
+        self._groups = {}
+        self._specs = {}
+
+    def configure(self, directory=None, enabled=True):
+        with self._lock:
+            self.directory = Path(directory) if directory else None
+            self.enabled = enabled
+            self._input_hashes = None
+
+    def _cache_dir(self):
+        if self.directory is not None:
+            return self.directory
+        data_dir = get_data_directory()
+        return data_dir / CACHE_SUBDIR if data_dir else None
+
+    # --- Hash de archivos de entrada ---
+
+    def _load_input_index(self, cache_dir):
+        if self._input_hashes is None:
+            try:
+                self._input_hashes = json.loads((cache_dir / INPUT_INDEX).read_text())
+            except (OSError, ValueError):
+                self._input_hashes = {}
+        return self._input_hashes
+
+    def _hash_input(self, cache_dir, path):
+        """sha256 de un archivo de entrada, reutilizando el valor memorizado si no cambió"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return "missing"
+        index = self._load_input_index(cache_dir)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        known = index.get(str(path))
+        if known and known[:2] == stamp:
+            return known[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        index[str(path)] = stamp + [digest.hexdigest()]
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(cache_dir / INPUT_INDEX, json.dumps(index, indent=1).encode())
+        return digest.hexdigest()
+
+    def hash_inputs(self, inputs):
+        """sha256 de cada archivo de entrada (relativo al directorio de datos)"""
+        cache_dir = self._cache_dir()
+        data_dir = get_data_directory()
+        with self._lock:
+            hashes = {}
+            for filename in inputs:
+                digest = self._hash_input(cache_dir, data_dir / filename) if data_dir else "missing"
+                if digest == "missing" and data_dir:
+                    # Sin el original, identificar la entrada por el hash de su versión comprimida
+                    entry = get_compressed_entry(data_dir, filename)
+                    digest = entry['source_sha256'] if entry else digest
+                hashes[filename] = digest
+        return hashes
+
+    def make_key(self, name, version, inputs, params):
+        material = json.dumps(
+            {'name': name, 'version': version, 'inputs': self.hash_inputs(inputs), 'params': params},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    def key_for(self, name, *args, **kwargs):
+        """Clave actual de un resultado registrado con `persistent` para unos argumentos"""
+        spec = self._specs[name]
+        extra = {'args': args, 'kwargs': kwargs, **(spec['params']() if spec['params'] else {})}
+        return self.make_key(name, spec['version'], spec['inputs'], extra)
+
+    def get(self, name, *args, **kwargs):
+        """Lee un resultado registrado para las entradas actuales; devuelve (encontrado, valor)"""
+        return self.load(name, self.key_for(name, *args, **kwargs))
+
+    def put(self, name, value, *args, **kwargs):
+        """Guarda un resultado calculado fuera del decorador (p. ej. refresco incremental)"""
+        self.save(name, self.key_for(name, *args, **kwargs), value)
+
+    # --- Lectura / escritura de resultados ---
+
+    def _path(self, cache_dir, name, key):
+        return cache_dir / f"{name}-{key}.pkl"
+
+    def load(self, name, key):
+        """Devuelve (encontrado, valor); los archivos corruptos se eliminan y cuentan como fallo"""
+        cache_dir = self._cache_dir()
+        path = self._path(cache_dir, name, key) if cache_dir else None
+        if path is None or not path.exists():
+            registry.inc("mapa_result_cache_total", result="miss", cache=name)
+            return False, None
+
+        try:
+            raw = path.read_bytes()
+            if not raw.startswith(MAGIC):
+                raise ValueError("cabecera desconocida")
+            header_end = raw.index(b"\n", len(MAGIC))
+            header = json.loads(raw[len(MAGIC):header_end])
+            payload = raw[header_end + 1:]
+            if len(payload) != header['size'] or hashlib.sha256(payload).hexdigest() != header['sha256']:
+                raise ValueError("checksum no coincide")
+            value = pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"⚠️ Resultado persistido corrupto ({path.name}): {e}; se recalculará")
+            registry.inc("mapa_result_cache_total", result="corrupt", cache=name)
+            path.unlink(missing_ok=True)
+            return False, None
+
+        registry.inc("mapa_result_cache_total", result="hit", cache=name)
+        return True, value
+
+    def save(self, name, key, value):
+        cache_dir = self._cache_dir()
+        if cache_dir is None:
+            return
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        header = json.dumps({
+            'name': name,
+            'created': time.time(),
+            'size': len(payload),
+            'sha256': hashlib.sha256(payload).hexdigest(),
+        }).encode()
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(cache_dir, name, key)
+        _write_atomic(path, MAGIC + header + b"\n" + payload)
+
+        # Eliminar resultados anteriores del mismo nombre (otras entradas o versiones)
+        for old in cache_dir.glob(f"{name}-*.pkl"):
+            if old != path:
+                old.unlink(missing_ok=True)
+        logger.info(f"💾 Resultado persistido: {path.name} ({len(payload) / 1e6:.1f} MB)")
+
+    def clear(self, group=None):
+        """Elimina los resultados persistidos, o solo los de un grupo; devuelve los nombres"""
+        cache_dir = self._cache_dir()
+        names = [name for name, groups in self._groups.items() if group is None or group in groups]
+        if cache_dir is not None and cache_dir.exists():
+            for name in names:
+                for path in cache_dir.glob(f"{name}-*.pkl"):
+                    path.unlink(missing_ok=True)
+        return names
+
+    def persistent(self, name, inputs=(), version=1, params=None, groups=()):
+        """Decorador: reutiliza el resultado guardado en disco si las entradas no cambiaron.
+
+        `inputs` son rutas relativas al directorio de datos; `params` es una función
+        opcional que devuelve parámetros adicionales que afectan al resultado.
+        """
+        # Un mismo resultado puede compartirse entre blueprints: unir sus grupos
+        self._groups[name] = tuple(dict.fromkeys(self._groups.get(name, ()) + tuple(groups)))
+        self._specs[name] = {'inputs': tuple(inputs), 'version': version, 'params': params}
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or self._cache_dir() is None:
+                    return func(*args, **kwargs)
+
+                try:
+                    key = self.key_for(name, *args, **kwargs)
+                    found, value = self.load(name, key)
+                except Exception as e:
+                    logger.warning(f"⚠️ Cache persistente no disponible para {name}: {e}")
+                    return func(*args, **kwargs)
+                if found:
+                    logger.info(f"⚡ {name} servido desde la cache persistente")
+                    return value
+
+                value = func(*args, **kwargs)
+                if not _is_empty(value):
+                    try:
+                        self.save(name, key, value)
+                    except Exception as e:
+                        logger.warning(f"⚠️ No se pudo persistir {name}: {e}")
+                return value
+            return wrapper
+        return decorator
+
+    def init_app(self, app):
+        """Aplica RESULT_CACHE_DIR / RESULT_CACHE_ENABLED de la configuración"""
+        self.configure(app.config.get('RESULT_CACHE_DIR'), app.config.get('RESULT_CACHE_ENABLED', True))
+
+
+results = ResultStore()
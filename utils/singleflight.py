@@ -0,0 +1,120 @@
+import functools
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize", "coalesced"])
+
+
+class _Call:
+    """Cálculo en curso compartido por todos los llamadores que esperan la misma clave"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """Cache LRU con semántica single-flight.
+
+    Si varios hilos piden la misma clave mientras se calcula, solo el primero ejecuta
+    la función y el resto espera su resultado (o su excepción). Mantiene la interfaz
+    de `functools.lru_cache` (`cache_clear`, `cache_info`).
+    """
+
+    def __init__(self, func, maxsize=1):
+        self.func = func
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+        self._hits = self._misses = self._coalesced = 0
+        self.clears = 0
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        key = args + tuple(sorted(kwargs.items())) if kwargs else args
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._hits += 1
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                generation = self._generation
+                self._misses += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self.func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            # Los que esperan reciben el resultado ya; el que llegue antes de guardarlo
+            # encuentra la llamada en curso terminada y tampoco recalcula
+            call.event.set()
+            # Preparar (p. ej. medir) fuera del lock: puede recorrer objetos grandes
+            prepared = self._prepare(call.result)
+            with self._lock:
+                # No guardar resultados calculados antes de un cache_clear()
+                if generation == self._generation:
+                    self._store(key, prepared)
+            return call.result
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is call:
+                    del self._inflight[key]
+            call.event.set()
+
+    def _lookup(self, key):
+        """Devuelve (encontrado, valor); se llama con el lock tomado"""
+        if key in self._results:
+            self._results.move_to_end(key)
+            return True, self._results[key]
+        return False, None
+
+    def _prepare(self, value):
+        """Valor a guardar para un resultado; se llama sin el lock tomado"""
+        return value
+
+    def _store(self, key, value):
+        """Guarda un resultado respetando maxsize; se llama con el lock tomado"""
+        self._results[key] = value
+        while self.maxsize is not None and len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _clear_results(self):
+        self._results.clear()
+
+    def _size(self):
+        return len(self._results)
+
+    def cache_clear(self):
+        with self._lock:
+            self._clear_results()
+            self._inflight.clear()
+            self._generation += 1
+            # Los contadores son totales de vida (contadores de Prometheus): no se reinician
+            self.clears += 1
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize, self._size(), self._coalesced)
+
+
+def single_flight_cache(maxsize=1):
+    """Decorador equivalente a `lru_cache(maxsize)` que además agrupa llamadas concurrentes"""
+    def decorator(func):
+        return SingleFlightCache(func, maxsize)
+    return decorator
@@ -0,0 +1,71 @@
+"""Tooltips diferidos de los límites administrativos.
+
+Las unidades se dibujan en una sola capa GeoJSON cuyas features solo llevan un id
+numérico: el código entero de la unidad, igual en todos los niveles de simplificación.
+El contenido de cada tooltip se pide al pasar el cursor a /api/tooltips/<nivel>, en
+lotes de ids, y se arma desde los agregados cacheados: la página no incrusta HTML por
+unidad y las cifras se actualizan sin volver a generar el mapa.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nivel -> etiqueta del tooltip
+TOOLTIP_LEVELS = {
+    'cantones': 'Cantón',
+    'parroquias': 'Parroquia',
+    'provincias': 'Provincia',
+}
+
+# Máximo de ids por petición
+TOOLTIP_MAX_IDS = 500
+
+# Segundos que el navegador (y cualquier proxy) reutiliza una respuesta antes de revalidarla
+TOOLTIP_MAX_AGE = 60
+
+
+def tooltip_table(population_data):
+    """{código: (nombre, población formateada)} desde una lista de agregados"""
+    return {item['code']: (item['name'], item['formatted_population']) for item in population_data}
+
+
+def parse_ids(value, max_ids=TOOLTIP_MAX_IDS):
+    """Ids de `ids=1,2,3` sin repetir, en orden; ValueError si son inválidos o demasiados"""
+    ids = list(dict.fromkeys(int(v) for v in value.split(',') if v.strip()))
+    if not ids or len(ids) > max_ids:
+        raise ValueError
+    return ids
+
+
+def tooltip_layer(layer_name, level):
+    """Contexto `capa_tooltips` de las plantillas: capa, nivel y límites de la API que usa el navegador"""
+    if not layer_name:
+        return None
+    return {
+        'layer': layer_name,
+        'level': level,
+        'label': TOOLTIP_LEVELS[level],
+        'max_age': TOOLTIP_MAX_AGE,
+        'batch_size': TOOLTIP_MAX_IDS,
+    }
+
+
+def add_id_layer(map_obj, gdf_units, name, style):
+    """Agrega las unidades al mapa como una sola capa GeoJSON con solo un id por feature.
+
+    Devuelve el nombre de la variable JavaScript de la capa para enlazar los tooltips.
+    """
+    import folium
+    from utils.aggregation import CODE_FIELD
+    collection = {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'id': code, 'geometry': geometry.__geo_interface__, 'properties': {}}
+            for code, geometry in zip(gdf_units[CODE_FIELD].tolist(), gdf_units.geometry)
+            if geometry is not None
+        ],
+    }
+    layer = folium.GeoJson(collection, name=name, style_function=lambda feature: style)
+    layer.add_to(map_obj)
+    logger.info(f"🏷️ Capa '{name}': {len(collection['features'])} unidades con tooltips diferidos")
+    return layer.get_name()
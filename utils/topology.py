@@ -0,0 +1,214 @@
+import logging
+import numpy as np
+from shapely.geometry import LineString, LinearRing, Polygon, MultiPolygon
+from shapely.validation import make_valid
+
+logger = logging.getLogger(__name__)
+
+
+def _ring_points(ring):
+    """Coordenadas de un anillo como tuplas, sin el punto de cierre repetido"""
+    coords = [tuple(c[:2]) for c in ring.coords]
+    if len(coords) > 1 and coords[0] == coords[-1]:
+        coords = coords[:-1]
+    return coords
+
+
+def _polygon_parts(geom):
+    if geom is None or geom.is_empty:
+        return []
+    if isinstance(geom, Polygon):
+        return [geom]
+    if isinstance(geom, MultiPolygon):
+        return list(geom.geoms)
+    if hasattr(geom, 'geoms'):
+        return [g for part in geom.geoms for g in _polygon_parts(part)]
+    return []
+
+
+def _canonical_closed(points):
+    """Rota y orienta un anillo sin uniones para que dos anillos iguales produzcan el mismo arco"""
+    start = min(range(len(points)), key=lambda i: points[i])
+    rotated = points[start:] + points[:start]
+    if len(rotated) > 2 and rotated[-1] < rotated[1]:
+        rotated = [rotated[0]] + rotated[:0:-1]
+    return rotated
+
+
+class Topology:
+    """Topología estilo TopoJSON: cada borde compartido entre polígonos se guarda una sola vez.
+
+    `shapes` contiene, por geometría, una lista de polígonos; cada polígono es una lista
+    de anillos y cada anillo una lista de referencias a arcos (`~i` indica el arco `i`
+    recorrido en sentido inverso).
+    """
+
+    def __init__(self, arcs, shapes):
+        self.arcs = arcs
+        self.shapes = shapes
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        """Extrae los arcos compartidos de una lista de geometrías poligonales"""
+        rings_by_shape = []
+        for geom in geometries:
+            polygons = []
+            for polygon in _polygon_parts(geom):
+                rings = [_ring_points(polygon.exterior)] + [_ring_points(r) for r in polygon.interiors]
+                polygons.append([r for r in rings if len(r) >= 3])
+            rings_by_shape.append(polygons)
+
+        # Un vértice es unión si aparece en anillos con vecinos distintos
+        first_neighbors = {}
+        junctions = set()
+        for polygons in rings_by_shape:
+            for rings in polygons:
+                for ring in rings:
+                    n = len(ring)
+                    for i, point in enumerate(ring):
+                        neighbors = frozenset((ring[i - 1], ring[(i + 1) % n]))
+                        seen = first_neighbors.setdefault(point, neighbors)
+                        if seen != neighbors:
+                            junctions.add(point)
+
+        arcs = []
+        arc_index = {}
+
+        def add_arc(points):
+            key = tuple(points)
+            if key in arc_index:
+                return arc_index[key]
+            reverse_key = key[::-1]
+            if reverse_key in arc_index:
+                return ~arc_index[reverse_key]
+            arc_index[key] = len(arcs)
+            arcs.append(np.asarray(points, dtype=np.float64))
+            return arc_index[key]
+
+        shapes = []
+        for polygons in rings_by_shape:
+            shape = []
+            for rings in polygons:
+                polygon_refs = []
+                for ring in rings:
+                    cuts = [i for i, point in enumerate(ring) if point in junctions]
+                    if not cuts:
+                        closed = _canonical_closed(ring)
+                        polygon_refs.append([add_arc(closed + [closed[0]])])
+                        continue
+
+                    rotated = ring[cuts[0]:] + ring[:cuts[0]]
+                    offsets = [c - cuts[0] for c in cuts] + [len(ring)]
+                    rotated.append(rotated[0])
+                    polygon_refs.append([
+                        add_arc(rotated[start:end + 1])
+                        for start, end in zip(offsets[:-1], offsets[1:])
+                    ])
+                shape.append(polygon_refs)
+            shapes.append(shape)
+
+        logger.info(f"🧩 Topología construida: {len(arcs):,} arcos para {len(shapes):,} geometrías")
+        return cls(arcs, shapes)
+
+    def simplify(self, tolerance):
+        """Simplifica cada arco una sola vez (Douglas-Peucker) conservando sus extremos"""
+        simplified = []
+        for arc in self.arcs:
+            if len(arc) <= 2:
+                simplified.append(arc)
+                continue
+            if np.array_equal(arc[0], arc[-1]):
+                line = LinearRing(arc).simplify(tolerance, preserve_topology=True)
+            else:
+                line = LineString(arc).simplify(tolerance, preserve_topology=False)
+            simplified.append(np.asarray(line.coords, dtype=np.float64))
+        return Topology(simplified, self.shapes)
+
+    def ring_coords(self, refs, arcs=None):
+        arcs = self.arcs if arcs is None else arcs
+        coords = []
+        for ref in refs:
+            arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+            coords.extend(arc if not coords else arc[1:])
+        return coords
+
+    def to_geometries(self, fallback=None):
+        """Reconstruye las geometrías; los anillos degenerados usan los arcos de `fallback`"""
+        geometries = []
+        for shape in self.shapes:
+            polygons = []
+            for polygon_refs in shape:
+                rings = []
+                for refs in polygon_refs:
+                    coords = self.ring_coords(refs)
+                    if len(coords) < 4 and fallback is not None:
+                        coords = fallback.ring_coords(refs)
+                    if len(coords) >= 4:
+                        rings.append(coords)
+                if rings:
+                    polygons.append(Polygon(rings[0], rings[1:]))
+
+            if not polygons:
+                geometries.append(None)
+                continue
+            geom = polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+            if not geom.is_valid:
+                geom = make_valid(geom)
+            geometries.append(geom)
+        return geometries
+
+    def to_topojson(self, layers, quantization=1e5):
+        """Serializa la topología como TopoJSON cuantizado con arcos delta-codificados.
+
+        `layers` es una lista de (nombre, propiedades) cuyas propiedades, concatenadas,
+        corresponden en orden a `self.shapes`.
+        """
+        points = np.concatenate([arc for arc in self.arcs if len(arc)]) if self.arcs else np.zeros((0, 2))
+        x0, y0 = points.min(axis=0) if len(points) else (0.0, 0.0)
+        x1, y1 = points.max(axis=0) if len(points) else (1.0, 1.0)
+        kx = (x1 - x0) / (quantization - 1) if x1 > x0 else 1.0
+        ky = (y1 - y0) / (quantization - 1) if y1 > y0 else 1.0
+
+        arcs = []
+        for arc in self.arcs:
+            q = np.round((arc - (x0, y0)) / (kx, ky)).astype(np.int64)
+            # Descartar puntos repetidos tras cuantizar sin perder los extremos
+            keep = np.ones(len(q), dtype=bool)
+            keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+            if keep.sum() < 2:
+                keep[-1] = True
+            q = q[keep]
+            delta = np.vstack([q[:1], np.diff(q, axis=0)])
+            arcs.append(delta.tolist())
+
+        objects = {}
+        shapes = iter(self.shapes)
+        for name, properties in layers:
+            geometries = []
+            for props, shape in zip(properties, shapes):
+                if not shape:
+                    geometries.append({"type": None, "properties": props})
+                elif len(shape) == 1:
+                    geometries.append({"type": "Polygon", "arcs": shape[0], "properties": props})
+                else:
+                    geometries.append({"type": "MultiPolygon", "arcs": shape, "properties": props})
+            objects[name] = {"type": "GeometryCollection", "geometries": geometries}
+
+        return {
+            "type": "Topology",
+            "transform": {"scale": [kx, ky], "translate": [float(x0), float(y0)]},
+            "objects": objects,
+            "arcs": arcs,
+        }
+
+
+def simplify_shared(geometries, tolerances):
+    """Simplifica un conjunto de geometrías respetando bordes compartidos a varias tolerancias.
+
+    Devuelve un diccionario {tolerancia: [geometrías]}; la topología se extrae una sola vez.
+    """
+    topology = Topology.from_geometries(geometries)
+    return {
+        tolerance: topology.simplify(tolerance).to_geometries(fallback=topology)
+        for tolerance in tolerances
+    }
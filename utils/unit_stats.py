@@ -0,0 +1,132 @@
+"""Tabla de estadísticas por unidad administrativa.
+
+Todas las columnas salen de reducciones agrupadas vectorizadas (bincount y un solo
+ordenamiento) sobre los pares punto-unidad de `aggregate_points`:
+
+- población, número de puntos y centroide ponderado por población;
+- área (km², CRS de áreas iguales) y densidad media;
+- mínimo, percentiles y máximo de la densidad de las celdas ocupadas de una malla
+  regular de STATS_CELL_SIZE grados dentro de cada unidad.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from utils.aggregation import AGGREGATION_LEVELS, CODE_FIELD, aggregate_points
+from utils.hexbin import KM_PER_DEGREE_LAT, KM_PER_DEGREE_LON
+
+logger = logging.getLogger(__name__)
+
+# Malla de densidad por celda: 0.01° (~1.1 km), la resolución más fina de utils.population_grid
+STATS_CELL_SIZE = 0.01
+STATS_PERCENTILES = (10, 50, 90)
+
+
+def grouped_percentiles(groups, values, n_groups, percentiles):
+    """Mínimo, percentiles (interpolación lineal) y máximo de `values` por grupo.
+
+    Devuelve un array (n_groups, len(percentiles) + 2); NaN en grupos sin valores.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    sizes = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    has_values = sizes > 0
+
+    result = np.full((n_groups, len(percentiles) + 2), np.nan)
+    for column, q in enumerate((0, *percentiles, 100)):
+        rank = starts[has_values] + q / 100 * (sizes[has_values] - 1)
+        lo = np.floor(rank).astype(np.int64)
+        hi = np.ceil(rank).astype(np.int64)
+        result[has_values, column] = values[lo] + (values[hi] - values[lo]) * (rank - lo)
+    return result
+
+
+def cell_densities(pair_points, pair_units, lons, lats, population, n_units, cell_size=STATS_CELL_SIZE):
+    """(unidad, densidad hab/km²) de cada celda ocupada de la malla dentro de cada unidad"""
+    cols = np.floor(lons[pair_points] / cell_size).astype(np.int64)
+    rows = np.floor(lats[pair_points] / cell_size).astype(np.int64)
+    col0, row0 = cols.min(), rows.min()
+    n_cols = int(cols.max() - col0) + 1
+    n_rows = int(rows.max() - row0) + 1
+    keys = (pair_units * n_rows + (rows - row0)) * n_cols + (cols - col0)
+    unique, inverse = np.unique(keys, return_inverse=True)
+
+    cell_population = np.bincount(inverse, weights=population[pair_points], minlength=len(unique))
+    cell_units, rest = np.divmod(unique, n_rows * n_cols)
+    cell_rows = rest // n_cols + row0
+    # Área de la celda en km² según la latitud de su centro
+    cell_lat = (cell_rows + 0.5) * cell_size
+    area = (cell_size * KM_PER_DEGREE_LON * np.cos(np.radians(cell_lat))) * (cell_size * KM_PER_DEGREE_LAT)
+    return cell_units, cell_population / area
+
+
+def rollup_membership(membership, parents, n_parents):
+    """(totales, pair_points, pair_units) de un nivel superior desde los de sus unidades.
+
+    `parents[i]` es la posición del padre de la unidad i (-1 si no tiene). Los totales son la
+    suma de los enteros de cada unidad, igual que los agregados de las APIs (population_list).
+    """
+    totals, pair_points, pair_units = membership
+    has_parent = parents >= 0
+    unit_population = np.trunc(np.round(totals, 6))
+    parent_totals = np.bincount(parents[has_parent], weights=unit_population[has_parent], minlength=n_parents)
+    pair_parents = parents[pair_units]
+    keep = pair_parents >= 0
+    return parent_totals, pair_points[keep], pair_parents[keep]
+
+
+def unit_stats(gdf_units, gdf_points, areas, level, membership=None):
+    """DataFrame con una fila por unidad (ver docstring del módulo).
+
+    `membership` (totales, pair_points, pair_units) evita el cruce espacial cuando ya se tiene,
+    p. ej. el de las provincias derivado de los cantones con `rollup_membership`.
+    """
+    spec = AGGREGATION_LEVELS[level]
+    n_units = len(gdf_units)
+    lons = gdf_points.geometry.x.to_numpy()
+    lats = gdf_points.geometry.y.to_numpy()
+    population = gdf_points['population'].to_numpy(dtype=np.float64)
+
+    if membership is None:
+        totals, _, (pair_points, pair_units) = aggregate_points(gdf_units, gdf_points)
+    else:
+        totals, pair_points, pair_units = membership
+    counts = np.bincount(pair_units, minlength=n_units)
+
+    # Centroide ponderado por población; sin población, promedio simple de los puntos
+    weights = np.where(totals[pair_units] > 0, population[pair_points], 1.0)
+    weight_sum = np.bincount(pair_units, weights=weights, minlength=n_units)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroid_lon = np.bincount(pair_units, weights=weights * lons[pair_points], minlength=n_units) / weight_sum
+        centroid_lat = np.bincount(pair_units, weights=weights * lats[pair_points], minlength=n_units) / weight_sum
+
+    codes = gdf_units[CODE_FIELD].to_numpy()
+    area = np.array([areas.get(code, np.nan) for code in codes.tolist()], dtype=np.float64)
+
+    columns = {
+        'code': codes,
+        'name': gdf_units[spec['name_field']].to_numpy() if spec['name_field'] in gdf_units.columns else None,
+    }
+    for key, field in spec['extra_fields'].items():
+        columns[key] = gdf_units[field].to_numpy() if field in gdf_units.columns else None
+    columns.update({
+        'population': np.round(totals, 6).astype(np.int64),
+        'points_count': counts,
+        'centroid_lon': np.round(centroid_lon, 6),
+        'centroid_lat': np.round(centroid_lat, 6),
+        'area_km2': np.round(area, 3),
+        'density': np.round(totals / area, 2),
+    })
+
+    if len(pair_points):
+        cell_units, densities = cell_densities(pair_points, pair_units, lons, lats, population, n_units)
+        summary = grouped_percentiles(cell_units, densities, n_units, STATS_PERCENTILES)
+    else:
+        summary = np.full((n_units, len(STATS_PERCENTILES) + 2), np.nan)
+    labels = ['min', *(f"p{q}" for q in STATS_PERCENTILES), 'max']
+    for column, label in enumerate(labels):
+        columns[f"cell_density_{label}"] = np.round(summary[:, column], 2)
+
+    table = pd.DataFrame(columns)
+    logger.info(f"📐 Estadísticas de {level}: {len(table)} unidades, {len(table.columns)} columnas")
+    return table